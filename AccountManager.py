@@ -1,18 +1,26 @@
-import json
 import os
 
 class AccountManager:
     def __init__(self, filename='accounts.json'):
         self.filename = filename
-        self.accounts = self.load_accounts()
+        self._accounts = None
+
+    @property
+    def accounts(self):
+        # 第一次登录、注册或更新战绩时才读取账户文件
+        if self._accounts is None:
+            self._accounts = self.load_accounts()
+        return self._accounts
 
     def load_accounts(self):
         if os.path.exists(self.filename):
+            import json
             with open(self.filename, 'r', encoding='utf-8') as file:
                 return json.load(file)
         return {}
 
     def save_accounts(self):
+        import json
         with open(self.filename, 'w', encoding='utf-8') as file:
             json.dump(self.accounts, file, indent=4)
 
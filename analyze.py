@@ -0,0 +1,284 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import time
+
+from lab01.board import Board
+from lab01.eval_cache import EvalCache, inverse_point, position_key, transform_point
+from lab01.record import format_sgf, iter_records, record_from_game
+
+# 最佳着法与实战着法的评分差达到阈值即标为失误，各游戏评分的量纲不同；
+# 围棋的评分只是3x3局部棋形的启发式，不能据此判断失误
+BLUNDER_THRESHOLDS = {'reversi': 20.0, 'go': None, 'gomoku': 400.0}
+# 每个任务分析的连续手数：任务开始时需要从开局回放到起始手，分段过短时回放的开销占比大
+CHUNK_PLIES = 32
+# 候选集合只由棋盘和行棋方决定的游戏，相同（或对称）的局面可以共用评分；围棋的合法点还取决于劫
+TRANSPOSABLE = ('reversi', 'gomoku')
+
+_evaluator = None
+# 每个工作进程一份局面缓存：批量分析的棋谱常有相同的开局，同一局面的候选评分只算一次
+_cache = None
+
+
+# ---------------- 各游戏的候选着法与评分 ----------------
+
+def _reversi_candidates(game, color):
+    size = game.board.size
+    return [(x, y) for y in range(size) for x in range(size)
+            if game.board.is_empty(x, y) and game._is_valid_move(x, y, color)]
+
+
+def _reversi_scorer(game, color):
+    # 与二级AI相同：模式表加行动力和稳定子
+    from lab01.reversi_eval import default_evaluator
+    evaluator = _evaluator or default_evaluator()
+    codes = evaluator.codes(game.board.grid)
+    return lambda x, y: evaluator.score_move(game, x, y, color, codes)
+
+
+def _go_candidates(game, color):
+    # 按模式权重从高到低，跳过自杀点和劫；逐个产出，超出时间预算时后面的点不必检查
+    weights = game.candidate_weights(color)
+    weights.sort(key=lambda item: -item[1])
+    for (x, y), _ in weights:
+        if game.is_legal(x, y, color):
+            yield x, y
+
+
+def _go_scorer(game, color):
+    # 局部棋形启发式，不是对全局的判断
+    return lambda x, y: game.pattern_weight(x, y, color)
+
+
+def _gomoku_candidates(game, color):
+    # 己方和对方的成五点优先，其余为距已有棋子两格以内的空点
+    grid = game.board.grid
+    size = game.board.size
+    opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+    urgent = game.winning_squares(color) + game.winning_squares(opponent)
+    near = set()
+    for x, y, _ in game.move_history:
+        for ny in range(max(0, y - 2), min(size, y + 3)):
+            for nx in range(max(0, x - 2), min(size, x + 3)):
+                if grid[ny][nx] == Board.EMPTY:
+                    near.add((nx, ny))
+    if not urgent and not near:
+        return [(size // 2, size // 2)]
+    return urgent + sorted(near.difference(urgent))
+
+
+def _gomoku_scorer(game, color):
+    # 在连子索引上试下一步，按双方的活四、冲四、活三数量打分后撤回
+    threats = game.threats
+    opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+    own_wins = set(threats.winning_squares(color))
+    opponent_wins = set(threats.winning_squares(opponent))
+
+    def score(x, y):
+        if (x, y) in own_wins:
+            return 10000.0
+        threats.place(x, y, color)
+        try:
+            value = 0.0
+            for player, sign in ((color, 1), (opponent, -1)):
+                value += sign * (500 * threats.count(player, 'open_four')
+                                 + 100 * threats.count(player, 'four')
+                                 + 20 * threats.count(player, 'open_three'))
+        finally:
+            threats.undo()
+        if (x, y) in opponent_wins:
+            value += 5000.0
+        return value
+    return score
+
+
+SCORERS = {
+    'reversi': (_reversi_candidates, _reversi_scorer),
+    'go': (_go_candidates, _go_scorer),
+    'gomoku': (_gomoku_candidates, _gomoku_scorer),
+}
+
+
+def _position_tag(game_type):
+    # 黑白棋的评分随权重变化，键里带上权重摘要
+    if game_type != 'reversi':
+        return game_type.encode()
+    from lab01.reversi_eval import default_evaluator
+    return (_evaluator or default_evaluator()).fingerprint()
+
+
+def evaluate_position(game, color, played, budget=None, cache=None):
+    # 对实战着法和候选着法评分；给定 budget（秒）时超时后不再评估剩余候选，实战着法总会评估。
+    # 给定 cache 时按对称归并后的局面缓存各候选的评分，坐标存为归并后的坐标
+    candidates, make_scorer = SCORERS[game.game_type]
+    size = game.board.size
+    key = scores = None
+    if cache is not None and game.game_type in TRANSPOSABLE:
+        key, t = position_key(game.board.grid, color, _position_tag(game.game_type))
+        known = cache.get(key)
+        if known is not None:
+            scores = {inverse_point(t, x, y, size): value for (x, y), value in known.items()}
+    if scores is None:
+        score = make_scorer(game, color)
+        deadline = time.perf_counter() + budget if budget else None
+        scores = {played: score(*played)}
+        for move in candidates(game, color):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            if move not in scores:
+                scores[move] = score(*move)
+        if key is not None:
+            cache.put(key, {transform_point(t, x, y, size): value for (x, y), value in scores.items()})
+    elif played not in scores:
+        # 缓存来自预算内没有评估到这一手的分析
+        scores[played] = make_scorer(game, color)(*played)
+    best = max(scores, key=scores.get)
+    return {
+        'move': played,
+        'color': color,
+        'score': scores[played],
+        'best': best,
+        'best_score': scores[best],
+        'loss': scores[best] - scores[played],
+        'searched': len(scores),
+    }
+
+
+# ---------------- 并行分析 ----------------
+
+def _init_worker(weights):
+    global _evaluator, _cache
+    _cache = EvalCache(capacity=10000)
+    _evaluator = None
+    if weights:
+        from lab01.reversi_eval import PatternEvaluator
+        _evaluator = PatternEvaluator.load(weights)
+
+
+def analyze_chunk(task):
+    index, record, start, end, budget = task
+    plies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = record.new_game()
+        game.replay_moves(record.moves[:start], validate=False)
+        for x, y, color in record.moves[start:end]:
+            if x is None:
+                plies.append(None)
+            else:
+                plies.append(evaluate_position(game, color, (x, y), budget, _cache))
+            game._fast_play(x, y, color)
+    return index, start, plies
+
+
+def _iter_tasks(records, budget, chunk):
+    for index, record in enumerate(records):
+        for start in range(0, len(record.moves), chunk):
+            yield index, record, start, min(start + chunk, len(record.moves)), budget
+
+
+def analyze_records(records, workers=None, budget=None, threshold=None, weights=None, chunk=CHUNK_PLIES):
+    # 返回每局每一手的分析结果列表，PASS 对应 None
+    records = list(records)
+    results = [[None] * len(record.moves) for record in records]
+    tasks = _iter_tasks(records, budget, chunk)
+    if workers == 1:
+        _init_worker(weights)
+        for index, start, plies in map(analyze_chunk, tasks):
+            results[index][start:start + len(plies)] = plies
+    else:
+        with multiprocessing.Pool(workers, _init_worker, (weights,)) as pool:
+            for index, start, plies in pool.imap_unordered(analyze_chunk, tasks):
+                results[index][start:start + len(plies)] = plies
+    for record, plies in zip(records, results):
+        limit = BLUNDER_THRESHOLDS[record.game_type]
+        if limit is not None and threshold is not None:
+            limit = threshold
+        for ply in plies:
+            if ply is not None:
+                ply['blunder'] = limit is not None and ply['loss'] >= limit
+    return records, results
+
+
+def annotate(plies, game_type=None):
+    label = "局部棋形分" if game_type == 'go' else "评分"
+    comments = []
+    for ply in plies:
+        if ply is None:
+            comments.append(None)
+            continue
+        text = f"{label} {ply['score']:.2f}，最佳 {ply['best'][0]} {ply['best'][1]} ({ply['best_score']:.2f})"
+        if ply['blunder']:
+            text += f"，失误 -{ply['loss']:.2f}"
+        comments.append(text)
+    return comments
+
+
+def write_analysis(records, results, filename):
+    with open(filename, 'w', encoding='utf-8') as f:
+        for record, plies in zip(records, results):
+            f.write(format_sgf(record, annotate(plies, record.game_type)))
+
+
+def summarize(records, results):
+    summary = []
+    for record, plies in zip(records, results):
+        stats = {Board.BLACK: [0, 0, 0.0], Board.WHITE: [0, 0, 0.0]}
+        for ply in plies:
+            if ply is None:
+                continue
+            entry = stats[ply['color']]
+            entry[0] += 1
+            entry[1] += ply['blunder']
+            entry[2] += ply['loss']
+        summary.append({
+            'game_type': record.game_type,
+            'moves': len(record.moves),
+            'blunders': {color: entry[1] for color, entry in stats.items()},
+            'average_loss': {color: entry[2] / entry[0] if entry[0] else 0.0
+                             for color, entry in stats.items()},
+        })
+    return summary
+
+
+def analyze_game(game, **options):
+    records, results = analyze_records([record_from_game(game)], **options)
+    return results[0]
+
+
+def analyze_file(filename, output=None, **options):
+    records, results = analyze_records(iter_records(filename), **options)
+    if output is None:
+        output = filename.rsplit('.', 1)[0] + '.analysis.sgf'
+    write_analysis(records, results, output)
+    return output, summarize(records, results)
+
+
+def print_summary(summary):
+    for i, s in enumerate(summary):
+        print(f"第{i}局 [{s['game_type']}] {s['moves']} 手，"
+              f"黑方失误 {s['blunders'][Board.BLACK]}（平均损失 {s['average_loss'][Board.BLACK]:.2f}），"
+              f"白方失误 {s['blunders'][Board.WHITE]}（平均损失 {s['average_loss'][Board.WHITE]:.2f}）"
+              + ("；围棋评分为局部棋形启发式，未标失误" if s['game_type'] == 'go' else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="逐手分析棋谱，标出失误并写出带注释的SGF")
+    parser.add_argument('file', help="棋谱文件（.sgf 或黑白棋棋谱）")
+    parser.add_argument('-o', '--output', help="输出的SGF文件，默认为 <file>.analysis.sgf")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument('--budget', type=float, default=None, help="每个局面的评估时间上限（秒）")
+    parser.add_argument('--threshold', type=float, default=None, help="失误阈值，默认按游戏类型取值（围棋不标失误）")
+    parser.add_argument('--weights', help="黑白棋模式评估权重（reversi_eval fit 的输出）")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    output, summary = analyze_file(args.file, args.output, workers=args.workers, budget=args.budget,
+                                   threshold=args.threshold, weights=args.weights)
+    print_summary(summary)
+    print(f"分析完成，用时 {time.perf_counter() - start:.2f} 秒，结果已写入 {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
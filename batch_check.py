@@ -0,0 +1,209 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import time
+
+from lab01 import instrument
+from lab01.board import Board
+from lab01.record import iter_records
+
+
+def game_winner(game):
+    # 返回胜方颜色，平局返回0，未结束返回None；不输出任何信息
+    if not game.is_over:
+        return None
+    if game.game_type == 'go':
+        black, white = game._count_territory()
+        black += game.captured_stones[Board.BLACK]
+        white += game.captured_stones[Board.WHITE]
+    elif game.game_type == 'reversi':
+        black = sum(row.count(Board.BLACK) for row in game.board.grid)
+        white = sum(row.count(Board.WHITE) for row in game.board.grid)
+    else:
+        return game.move_history[-1][2]
+    if black > white:
+        return Board.BLACK
+    if white > black:
+        return Board.WHITE
+    return 0
+
+
+def _is_ko_capture(game, x, y, captured):
+    # 只提一子、落子自身孤立且只剩一口气（即被提的位置），即为劫争
+    if captured != 1:
+        return False
+    board = game.board
+    color = board.get_color(x, y)
+    liberties = 0
+    for nx, ny in board.get_neighbors(x, y):
+        if board.get_color(nx, ny) == color:
+            return False
+        if board.is_empty(nx, ny):
+            liberties += 1
+    return liberties == 1
+
+
+def check_record(item):
+    source, index, record = item
+    if isinstance(record, Exception):
+        # 无法读取或解析的文件、对局
+        return {'source': source, 'index': index, 'game_type': None, 'error': str(record)}
+    result = {
+        'source': source,
+        'index': index,
+        'game_type': record.game_type,
+        # 让子棋或 PL[W] 的棋谱由白方先走
+        'first_player': record.first_player,
+        'moves': 0,
+        'captures': 0,
+        'kos': 0,
+        'winner': None,
+        'error': None,
+    }
+    try:
+        # 不支持的棋盘大小、棋盘外的摆子等在建立对局时就会出错
+        game = record.new_game()
+    except ValueError as e:
+        result['error'] = f"无法建立对局：{e}"
+        return result
+    is_go = game.game_type == 'go'
+    with contextlib.redirect_stdout(io.StringIO()):
+        for ply, (x, y, color) in enumerate(record.moves):
+            try:
+                if game.is_over:
+                    raise ValueError("游戏已结束，棋谱中仍有多余的落子")
+                if color != game.current_player:
+                    raise ValueError("棋谱中的落子方与当前玩家不符")
+                before = sum(game.captured_stones.values()) if is_go else 0
+                game.play_move(x, y)
+            except ValueError as e:
+                result['error'] = f"第{ply}手 {(x, y)}：{e}"
+                break
+            if x is not None:
+                result['moves'] += 1
+            if is_go and x is not None:
+                captured = sum(game.captured_stones.values()) - before
+                result['captures'] += captured
+                if _is_ko_capture(game, x, y, captured):
+                    result['kos'] += 1
+        if result['error'] is None:
+            result['winner'] = game_winner(game)
+    if instrument.enabled:
+        result['stats'] = instrument.take()
+    return result
+
+
+def _iter_items(filenames):
+    # 格式错误的对局和无法读取的文件也作为条目产出，由 check_record 报告为违规，不中断整批校验
+    for filename in filenames:
+        try:
+            for index, record in enumerate(iter_records(filename, strict=False)):
+                yield filename, index, record
+        except (OSError, ValueError) as e:
+            yield filename, None, e
+
+
+class Summary:
+    def __init__(self):
+        self.by_type = {}
+        self.illegal = []
+        self.unreadable = 0
+
+    def add(self, result):
+        if 'stats' in result:
+            instrument.merge(result['stats'])
+        if result['game_type'] is None:
+            self.unreadable += 1
+            self.illegal.append(result)
+            return
+        stats = self.by_type.setdefault(result['game_type'], {
+            'games': 0, 'moves': 0, 'captures': 0, 'kos': 0,
+            'finished': 0, 'first_player_wins': 0, 'illegal': 0,
+        })
+        stats['games'] += 1
+        if result['error'] is not None:
+            stats['illegal'] += 1
+            self.illegal.append(result)
+            return
+        stats['moves'] += result['moves']
+        stats['captures'] += result['captures']
+        stats['kos'] += result['kos']
+        if result['winner'] is not None:
+            stats['finished'] += 1
+            if result['winner'] == result['first_player']:
+                stats['first_player_wins'] += 1
+
+    def report(self, elapsed):
+        total = sum(s['games'] for s in self.by_type.values()) + self.unreadable
+        report = {'games': total, 'seconds': elapsed,
+                  'games_per_second': total / elapsed if elapsed > 0 else 0.0,
+                  'unreadable': self.unreadable, 'types': {}, 'illegal': self.illegal}
+        for game_type, s in self.by_type.items():
+            legal = s['games'] - s['illegal']
+            report['types'][game_type] = {
+                'games': s['games'],
+                'illegal': s['illegal'],
+                'average_length': s['moves'] / legal if legal else 0.0,
+                'average_captures': s['captures'] / legal if legal else 0.0,
+                'ko_per_game': s['kos'] / legal if legal else 0.0,
+                'first_player_win_rate': s['first_player_wins'] / s['finished'] if s['finished'] else 0.0,
+            }
+        return report
+
+
+def _init_worker(stats):
+    if stats:
+        instrument.enable()
+
+
+def run(filenames, workers=None, chunksize=32, stats=False):
+    summary = Summary()
+    start = time.perf_counter()
+    items = _iter_items(filenames)
+    if workers == 1:
+        _init_worker(stats)
+        for item in items:
+            summary.add(check_record(item))
+    else:
+        with multiprocessing.Pool(workers, _init_worker, (stats,)) as pool:
+            for result in pool.imap_unordered(check_record, items, chunksize):
+                summary.add(result)
+    return summary.report(time.perf_counter() - start)
+
+
+def print_report(report):
+    print(f"共检查 {report['games']} 局，用时 {report['seconds']:.2f} 秒，"
+          f"{report['games_per_second']:.1f} 局/秒")
+    for game_type, s in report['types'].items():
+        print(f"[{game_type}] 对局数 {s['games']}，违规 {s['illegal']}，"
+              f"平均手数 {s['average_length']:.1f}，平均提子 {s['average_captures']:.2f}，"
+              f"每局劫争 {s['ko_per_game']:.2f}，先手胜率 {s['first_player_win_rate']:.3f}")
+    if report['unreadable']:
+        print(f"无法解析 {report['unreadable']} 项")
+    for r in report['illegal']:
+        where = r['source'] if r['index'] is None else f"{r['source']} 第{r['index']}局"
+        print(f"违规：{where} {r['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量校验棋谱并统计数据")
+    parser.add_argument('files', nargs='+', help="棋谱文件（.sgf 或黑白棋棋谱）")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument('--json', metavar='FILE', help="将统计结果写入JSON文件")
+    parser.add_argument('--stats', metavar='FILE', help="开启性能统计并将各阶段耗时写入JSON文件")
+    args = parser.parse_args(argv)
+
+    report = run(args.files, args.workers, stats=bool(args.stats))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+    if args.stats:
+        instrument.dump(args.stats)
+    return 1 if report['illegal'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+import argparse
+import contextlib
+import copy
+import io
+import json
+import pickle
+import random
+import statistics
+import sys
+import time
+
+from lab01.game import GomokuGame, GoGame, Reversi
+
+SEED = 20240601
+# 基准棋谱的局数：每次运行的工作量固定，且足够大，单次运行不至于只有毫秒级
+GAME_COUNT = 16
+# 每个样本至少累计计时的秒数，不足时重复运行
+MIN_TIME = 0.2
+
+
+def random_record(game_cls, size, seed, max_moves):
+    # 用固定种子随机走子生成对局，保证每次运行的基准棋谱完全一致
+    rng = random.Random(seed)
+    game = game_cls(size)
+    with contextlib.redirect_stdout(io.StringIO()):
+        while not game.is_over and len(game.move_history) < max_moves:
+            if isinstance(game, Reversi):
+                moves = [(x, y) for x in range(size) for y in range(size)
+                         if game._is_valid_move(x, y, game.current_player)]
+                if not moves:
+                    break
+                game.play_move(*rng.choice(moves))
+                continue
+            empties = [(x, y) for x in range(size) for y in range(size) if game.board.is_empty(x, y)]
+            rng.shuffle(empties)
+            for x, y in empties:
+                try:
+                    game.play_move(x, y)
+                    break
+                except ValueError:
+                    continue
+            else:
+                break
+    return list(game.move_history)
+
+
+def recorded_games(count=GAME_COUNT):
+    games = {'gomoku': [], 'go': [], 'reversi': []}
+    for i in range(count):
+        games['gomoku'].append(random_record(GomokuGame, 15, SEED + i, 120))
+        games['go'].append(random_record(GoGame, 9, SEED + i, 100))
+        games['reversi'].append(random_record(Reversi, 8, SEED + i, 60))
+    return games
+
+
+GAME_SETUP = {'gomoku': (GomokuGame, 15), 'go': (GoGame, 9), 'reversi': (Reversi, 8)}
+
+
+def _play_all(game_type, moves):
+    game_cls, size = GAME_SETUP[game_type]
+    game = game_cls(size)
+    for x, y, _ in moves:
+        game.play_move(x, y)
+    return game
+
+
+def bench_apply(game_type, records):
+    def run():
+        n = 0
+        for moves in records:
+            _play_all(game_type, moves)
+            n += len(moves)
+        return n
+    return run
+
+
+def bench_undo(game_type, records):
+    def run():
+        games = [_play_all(game_type, moves) for moves in records]
+        start = time.perf_counter()
+        n = 0
+        for game in games:
+            while game.move_history:
+                game.undo_move()
+                n += 1
+        return n, time.perf_counter() - start
+    return run
+
+
+def bench_reversi_legal(records):
+    positions = _positions('reversi', records)
+
+    def run():
+        n = 0
+        for game in positions:
+            color = game.current_player
+            for x in range(8):
+                for y in range(8):
+                    game._is_valid_move(x, y, color)
+            game._has_valid_moves(game._opponent_color(color))
+            n += 1
+        return n
+    return run
+
+
+def bench_gomoku_check_win(records):
+    positions = _positions('gomoku', records)
+
+    def run():
+        n = 0
+        for game in positions:
+            x, y, color = game.move_history[-1]
+            game.current_player = color
+            game.check_win(x, y)
+            n += 1
+        return n
+    return run
+
+
+def bench_save_load(game_type, records):
+    # save_game/load_game 就是对局对象的 pickle；只在内存中序列化，不把磁盘读写的波动计入
+    games = [_play_all(game_type, moves) for moves in records]
+
+    def run():
+        for game in games:
+            pickle.loads(pickle.dumps(game))
+        return len(games)
+    return run
+
+
+def bench_territory(records):
+    games = [_play_all('go', moves) for moves in records]
+
+    def run():
+        for game in games:
+            game._count_territory()
+        return len(games)
+    return run
+
+
+def bench_ai_decision(records):
+    from lab01.client_new import Client
+    from lab01.eval_cache import EvalCache
+    positions = _positions('reversi', records, step=4)
+
+    def run():
+        # 每次运行用新的客户端和空的进程内缓存，不受前几次运行和 LAB01_EVAL_CACHE 共享表的影响
+        client = Client()
+        client.eval_cache = EvalCache()
+        games = [copy.deepcopy(game) for game in positions]
+        start = time.perf_counter()
+        for game in games:
+            client.game = game
+            client.ai_move_level_2(game.current_player)
+        return len(games), time.perf_counter() - start
+    return run
+
+
+def _positions(game_type, records, step=1):
+    positions = []
+    for moves in records:
+        for i in range(1, len(moves), step):
+            positions.append(_play_all(game_type, moves[:i]))
+    return positions
+
+
+def build_benchmarks(games):
+    benchmarks = {}
+    for game_type, records in games.items():
+        benchmarks[f'apply.{game_type}'] = ('moves', bench_apply(game_type, records))
+        benchmarks[f'undo.{game_type}'] = ('moves', bench_undo(game_type, records))
+        benchmarks[f'save_load.{game_type}'] = ('games', bench_save_load(game_type, records))
+    benchmarks['legal.reversi'] = ('positions', bench_reversi_legal(games['reversi']))
+    benchmarks['check_win.gomoku'] = ('positions', bench_gomoku_check_win(games['gomoku']))
+    benchmarks['territory.go'] = ('games', bench_territory(games['go']))
+    benchmarks['ai.reversi_level2'] = ('decisions', bench_ai_decision(games['reversi']))
+    return benchmarks
+
+
+def sample(run, min_time=MIN_TIME):
+    # 重复运行到累计计时不少于 min_time，返回每秒完成的数量
+    total = 0
+    elapsed = 0.0
+    while elapsed < min_time:
+        start = time.perf_counter()
+        result = run()
+        spent = time.perf_counter() - start
+        if isinstance(result, tuple):
+            result, spent = result
+        total += result
+        elapsed += spent
+    return total / elapsed
+
+
+def run_benchmarks(names=None, repeat=5, min_time=MIN_TIME):
+    # 各项基准轮流采样，使系统负载的波动平摊到所有项上，再取各项样本的中位数；
+    # spread 为样本极差与中位数之比，是这台机器上这一项的测量噪声
+    with contextlib.redirect_stdout(io.StringIO()):
+        benchmarks = {name: bench for name, bench in build_benchmarks(recorded_games()).items()
+                      if not names or any(name.startswith(n) for n in names)}
+        rates = {name: [] for name in benchmarks}
+        for _ in range(repeat):
+            for name, (unit, run) in benchmarks.items():
+                rates[name].append(sample(run, min_time))
+    results = {}
+    for name, (unit, run) in benchmarks.items():
+        median = statistics.median(rates[name])
+        results[name] = {'unit': unit, 'per_second': median,
+                         'spread': (max(rates[name]) - min(rates[name])) / median}
+    return results
+
+
+def compare(results, baseline, threshold):
+    # 变慢的比例同时超过阈值和两次测量中较大的噪声才算回退
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]['per_second']
+        change = result['per_second'] / old - 1 if old else 0.0
+        noise = max(result['spread'], baseline[name].get('spread', 0.0))
+        result['baseline'] = old
+        result['change'] = change
+        result['noise'] = noise
+        if change < -threshold and -change > noise:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="规则引擎与AI的性能基准测试")
+    parser.add_argument('names', nargs='*', help="只运行以这些名字开头的基准")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="每项的样本数，取中位数")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help="每个样本至少计时的秒数")
+    parser.add_argument('-o', '--output', help="将结果写入JSON文件")
+    parser.add_argument('-b', '--baseline', help="与基线JSON文件比较")
+    parser.add_argument('-t', '--threshold', type=float, default=0.1, help="判定性能回退的比例阈值，变慢还须超过测得的噪声")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, args.repeat, args.min_time)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    for name, result in results.items():
+        line = f"{name:24} {result['per_second']:12.1f} {result['unit']}/s"
+        if 'change' in result:
+            line += f"  {result['change']:+.1%} (噪声 {result['noise']:.1%})"
+            if name in regressions:
+                line += "  回退!"
+        print(line, file=sys.stderr)
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -9,6 +9,12 @@ class Board:
         self.size = size
         self.grid = [[self.EMPTY for _ in range(size)] for _ in range(size)]
 
+    def copy(self):
+        board = self.__class__.__new__(self.__class__)
+        board.__dict__.update(self.__dict__)
+        board.grid = [row[:] for row in self.grid]
+        return board
+
     def place_stone(self, x, y, color):
         if not (0 <= x < self.size and 0 <= y < self.size):
             raise ValueError("落子位置超出棋盘范围")
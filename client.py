@@ -1,4 +1,6 @@
-from lab01.game import *
+import sys
+
+from lab01 import registry
 
 class Client:
     def __init__(self):
@@ -71,15 +73,10 @@ class Client:
         if not (8 <= size <= 19):
             print("棋盘大小必须在8到19之间")
             return
-        if game_type == 'gomoku':
-            self.game = GomokuGame(size)
-        elif game_type == 'go':
-            self.game = GoGame(size)
-        elif game_type == 'reversi':
-            self.game = Reversi(size)
-        else:
+        if game_type not in registry.GAME_TYPES:
             print("未知的游戏类型")
             return
+        self.game = registry.create_game(game_type, size)
         print(f"游戏开始！棋盘大小为{self.game.board.size}x{self.game.board.size}")
         self.game.display()
 
@@ -91,7 +88,7 @@ class Client:
             x, y = int(args[1]), int(args[2])
             self.game.play_move(x, y)
             self.game.display()
-        elif len(args) == 1 and isinstance(self.game, GoGame):
+        elif len(args) == 1 and self.game.game_type == 'go':
             self.game.play_move(None, None)
             print("玩家选择PASS")
             self.game.display()
@@ -102,7 +99,7 @@ class Client:
         if not self.game or self.game.is_over:
             print("游戏未开始或已结束")
             return
-        if isinstance(self.game, GoGame):
+        if self.game.game_type == 'go':
             self.game.play_move(None, None)
             print("玩家选择PASS")
             self.game.display()
@@ -136,7 +133,7 @@ class Client:
             print("指令格式错误")
             return
         filename = args[1]
-        self.game = Game.load_game(filename)
+        self.game = registry.load_game(filename)
         print(f"已从 {filename} 加载游戏")
         self.game.display()
 
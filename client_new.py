@@ -1,8 +1,15 @@
+import argparse
+import contextlib
+import io
+import os
 import random
 import sys
 
+from lab01 import instrument, registry
 from lab01.AccountManager import AccountManager
-from lab01.game import *
+from lab01.board import Board
+from lab01.eval_cache import EvalCache, move_key, position_key
+from lab01.ponder import Ponderer
 
 class Client:
     def __init__(self):
@@ -13,6 +20,17 @@ class Client:
         self.account_manager = AccountManager()
         self.user1 = None
         self.user2 = None
+        # 设置 LAB01_EVAL_CACHE=<文件名> 时，多个进程通过内存映射文件共享评估结果
+        self.eval_cache = EvalCache(path=os.environ.get('LAB01_EVAL_CACHE'))
+        self.evaluator = None
+        # 当前黑白棋权重文件，None 为默认权重；棋谱分析沿用同一份权重
+        self.weights_file = os.environ.get('LAB01_REVERSI_WEIGHTS')
+        self.pondering = False
+        self.ponderer = Ponderer(self._ranked_moves)
+        self.journal = None
+        # 脚本模式下出错即抛出异常，show_board 控制每条指令后是否显示棋盘
+        self.batch = False
+        self.show_board = True
 
     def start(self):
         print("欢迎来到五子棋和围棋和黑白棋游戏！")
@@ -21,7 +39,9 @@ class Client:
                 self.display_prompt()
                 self.show_prompt = False
 
+            self._start_pondering()
             command = input("\n请输入指令：").strip()
+            self.ponderer.stop()
             if not command:
                 continue
 
@@ -33,6 +53,68 @@ class Client:
             except Exception as e:
                 print(f"发生错误：{e}")
 
+    def run_script(self, lines, display=True, json_output=False):
+        # 脚本模式：逐行执行与交互模式相同的指令，不显示提示；遇到第一个错误时报告行号并停止，返回退出码。
+        # json_output 时每条指令输出一行JSON，包含该指令的输出和执行后的对局状态
+        self.batch = True
+        self.show_board = display
+        try:
+            for lineno, line in enumerate(lines, 1):
+                command = line.strip()
+                if not command or command.startswith('#'):
+                    continue
+                args = command.split()
+                cmd = args[0].lower()
+                output = io.StringIO()
+                error = None
+                finished = False
+                try:
+                    with contextlib.redirect_stdout(output) if json_output else contextlib.nullcontext():
+                        if cmd in ('register', 'login', 'replay'):
+                            raise ValueError("脚本模式不支持需要交互输入的指令")
+                        self.handle_command(cmd, args)
+                except SystemExit:
+                    finished = True
+                except Exception as e:
+                    error = str(e)
+                if json_output:
+                    import json
+                    print(json.dumps(self._script_result(lineno, command, error, output.getvalue()),
+                                     ensure_ascii=False))
+                if error is not None:
+                    print(f"第{lineno}行：{command}：{error}", file=sys.stderr)
+                    return 1
+                if finished:
+                    return 0
+            return 0
+        finally:
+            self._close_journal()
+            self.batch = False
+            self.show_board = True
+
+    def _script_result(self, lineno, command, error, output):
+        game = None
+        if self.game:
+            game = {
+                'type': self.game.game_type,
+                'size': self.game.board.size,
+                'current_player': self.game.current_player,
+                'is_over': self.game.is_over,
+                'moves': len(self.game.move_history),
+            }
+        return {'line': lineno, 'command': command, 'ok': error is None, 'error': error,
+                'output': output, 'game': game}
+
+    def _error(self, message):
+        # 交互模式下只提示，脚本模式下抛出异常，由 run_script 报告行号并停止
+        if self.batch:
+            raise ValueError(message)
+        print(message)
+
+    def _display(self):
+        if self.show_board:
+            self.game.display()
+
     def _current_AI_player(self):
         return ((Board.BLACK == self.game.current_player and self.player_black > 0) or
                 (Board.WHITE == self.game.current_player and self.player_white > 0))
@@ -53,6 +135,14 @@ class Client:
         print("11. register - 注册")
         print("12. login <color> - 登录到指定颜色")
         print("13. replay <filename> - 回放指定文件")
+        print("14. export <filename> - 导出棋谱（.sgf 为SGF格式，其余为黑白棋棋谱）")
+        print("15. import <filename> [index] - 导入棋谱文件中的第index局（默认第0局）")
+        print("16. stats [on|off|reset|dump <filename>] - 性能统计：开启/关闭/清零/导出JSON，不带参数则显示")
+        print("17. ponder <on|off> - 等待玩家输入时让AI在后台预先思考")
+        print("18. journal <filename|off> - 将每一步追加写入日志，崩溃后可恢复")
+        print("19. recover <filename> - 从日志及其检查点恢复对局并继续记录")
+        print("20. analyze <filename> [output] [budget <秒>] [weights <filename|default>] - 逐手分析棋谱，标出失误并写出带注释的SGF，默认沿用当前的黑白棋权重")
+        print("21. weights <filename|default> - 黑白棋二级AI改用 reversi_eval fit 拟合出的权重，或恢复默认权重")
 
     def handle_command(self, cmd, args):
         if cmd == 'start':
@@ -76,6 +166,7 @@ class Client:
         elif cmd == 'prompt':
             self.set_prompt(args)
         elif cmd == 'exit':
+            self._close_journal()
             print("感谢游玩，再见！")
             sys.exit()
         elif cmd == 'register':
@@ -84,90 +175,112 @@ class Client:
             self.login(args)
         elif cmd == 'replay':
             self.replay(args)
+        elif cmd == 'export':
+            self.export(args)
+        elif cmd == 'import':
+            self.import_record(args)
+        elif cmd == 'stats':
+            self.stats(args)
+        elif cmd == 'ponder':
+            self.set_pondering(args)
+        elif cmd == 'journal':
+            self.set_journal(args)
+        elif cmd == 'recover':
+            self.recover(args)
+        elif cmd == 'analyze':
+            self.analyze(args)
+        elif cmd == 'weights':
+            self.set_weights(args)
         else:
-            print("未知指令")
+            self._error("未知指令")
         while self.game and self._current_AI_player()  and not self.game.is_over:
             self.play_ai_turn()
 
     def start_game(self, args):
         if len(args) != 3:
-            print("指令格式错误")
+            self._error("指令格式错误")
             return
         game_type = args[1]
         size = int(args[2])
         if not (8 <= size <= 19):
-            print("棋盘大小必须在8到19之间")
+            self._error("棋盘大小必须在8到19之间")
             return
-        if game_type == 'gomoku':
-            self.game = GomokuGame(size)
-        elif game_type == 'go':
-            self.game = GoGame(size)
-        elif game_type == 'reversi':
-            self.game = Reversi(size)
-        else:
-            print("未知的游戏类型")
+        if game_type not in registry.GAME_TYPES:
+            self._error("未知的游戏类型")
             return
+        self.game = registry.create_game(game_type, size)
+        self._new_journal_session()
         print(f"游戏开始！棋盘大小为{self.game.board.size}x{self.game.board.size}")
-        self.game.display()
+        self._display()
 
     def move(self, args):
         if not self.game or self.game.is_over:
-            print("游戏未开始或已结束")
+            self._error("游戏未开始或已结束")
             return
         if len(args) == 3:
             x, y = int(args[1]), int(args[2])
-            self.game.play_move(x, y)
-            self.game.display()
-        elif len(args) == 1 and isinstance(self.game, GoGame):
-            self.game.play_move(None, None)
+            self._play(x, y)
+            self._display()
+        elif len(args) == 1 and self.game.game_type == 'go':
+            self._play(None, None)
             print("玩家选择PASS")
-            self.game.display()
+            self._display()
         else:
-            print("指令格式错误")
+            self._error("指令格式错误")
         if self.game.is_over:
-            if isinstance(self.game, GoGame):
-                if self.game.check_winner() == 1:
-                    self.account_manager.update_stats(self.user1, True)
-                    self.account_manager.update_stats(self.user1, False)
-                elif self.game.check_winner() == 2:
-                    self.account_manager.update_stats(self.user1, False)
-                    self.account_manager.update_stats(self.user1, True)
-            else:
-                if self.game.current_player == Board.BLACK:
-                    self.account_manager.update_stats(self.user1, True)
-                    self.account_manager.update_stats(self.user1, False)
-                else:
-                    self.account_manager.update_stats(self.user1, False)
-                    self.account_manager.update_stats(self.user1, True)
+            self._record_result()
+
+    def _record_result(self):
+        # 对局结束后更新已登录玩家的战绩：user1 执黑，user2 执白；未登录的一方和平局不记录
+        from lab01.batch_check import game_winner
+        winner = game_winner(self.game)
+        if not winner:
+            return
+        for color, user in ((Board.BLACK, self.user1), (Board.WHITE, self.user2)):
+            if user is not None:
+                self.account_manager.update_stats(user, winner == color)
 
     def pass_turn(self):
         if not self.game or self.game.is_over:
-            print("游戏未开始或已结束")
+            self._error("游戏未开始或已结束")
             return
-        if isinstance(self.game, GoGame):
-            self.game.play_move(None, None)
+        if self.game.game_type == 'go':
+            self._play(None, None)
             print("玩家选择PASS")
-            self.game.display()
+            self._display()
         else:
-            print("五子棋不支持PASS")
+            self._error("五子棋不支持PASS")
 
     def undo(self):
         if not self.game or self.game.is_over:
-            print("游戏未开始或已结束")
+            self._error("游戏未开始或已结束")
             return
         self.game.undo_move()
-        self.game.display()
+        if self.journal:
+            self.journal.log_undo()
+        self._display()
+
+    def _play(self, x, y):
+        color = self.game.current_player
+        self.game.play_move(x, y)
+        if self.journal:
+            if x is None:
+                self.journal.log_pass(color)
+            else:
+                self.journal.log_move(x, y, color)
 
     def resign(self):
         if not self.game or self.game.is_over:
-            print("游戏未开始或已结束")
+            self._error("游戏未开始或已结束")
             return
         print(f"玩家 {self.game._player_repr(self.game.current_player)} 认负！")
         self.game.is_over = True
+        if self.journal:
+            self.journal.log_resign(self.game.current_player)
 
     def save(self, args):
         if len(args) != 2:
-            print("指令格式错误")
+            self._error("指令格式错误")
             return
         filename = args[1]
         self.game.save_game(filename)
@@ -175,41 +288,72 @@ class Client:
 
     def load(self, args):
         if len(args) != 2:
-            print("指令格式错误")
+            self._error("指令格式错误")
             return
         filename = args[1]
-        self.game = Game.load_game(filename)
+        self.game = registry.load_game(filename)
+        self._new_journal_session()
         print(f"已从 {filename} 加载游戏")
-        self.game.display()
+        self._display()
+
+    def export(self, args):
+        if len(args) != 2:
+            self._error("指令格式错误")
+            return
+        if not self.game:
+            self._error("游戏未开始")
+            return
+        from lab01.record import export_records
+        filename = args[1]
+        export_records([self.game], filename)
+        print(f"棋谱已导出至 {filename}")
+
+    def import_record(self, args):
+        if len(args) not in (2, 3):
+            self._error("指令格式错误")
+            return
+        from lab01.record import iter_records
+        filename = args[1]
+        index = int(args[2]) if len(args) == 3 else 0
+        for i, record in enumerate(iter_records(filename)):
+            if i == index:
+                self.game = record.build_game()
+                self._new_journal_session()
+                print(f"已从 {filename} 导入第 {index} 局")
+                self._display()
+                return
+        self._error("棋谱文件中没有该局")
 
     def restart(self):
         if not self.game:
-            print("游戏未开始")
+            self._error("游戏未开始")
             return
         self.player_white = 0
         self.player_black = 0
         self.game.restart()
+        if self.journal:
+            self.journal.log_restart()
         print("游戏已重新开始")
-        self.game.display()
+        self._display()
 
     def set_color_level(self, args):
-        if not isinstance(self.game, Reversi):
-            print("AI功能只支持黑白棋")
+        if not self.game or self.game.game_type != 'reversi':
+            self._error("AI功能只支持黑白棋")
             return
         if len(args) != 3:
-            print("指令格式错误")
+            self._error("指令格式错误")
             return
         color = args[1].lower()
         level = int(args[2])
         if level < 0 or level > 2:
-            print("难度等级必须为 0、1 或 2")
+            self._error("难度等级必须为 0、1 或 2")
             return
         if color == 'black':
             self.player_black = level
         elif color == 'white':
             self.player_white = level
         else:
-            print("颜色必须为 black 或 white")
+            self._error("颜色必须为 black 或 white")
             return
         print(f"{color} 玩家已设置为等级 {level}")
 
@@ -231,44 +375,192 @@ class Client:
 
     def ai_move_level_1(self, color):
         # AI 随机选择合法位置
-        valid_moves = self.get_valid_moves(color)
+        with instrument.timer('ai.level1'):
+            valid_moves = self.get_valid_moves(color)
         if valid_moves:
             move = random.choice(valid_moves)
             # self.move(['move', move[0], move[1]])
-            self.game.play_move(move[0], move[1])
-            self.game.display()
+            self._play(move[0], move[1])
+            self._display()
 
     def ai_move_level_2(self, color):
-        # AI 选择评分最高的位置
-        best_move = None
-        best_score = -float('inf')
-        valid_moves = self.get_valid_moves(color)
-        for move in valid_moves:
-            score = self.evaluate_move(move[0], move[1], color)
-            if score > best_score:
-                best_score = score
-                best_move = move
+        # AI 选择评分最高的位置，后台预先思考命中时直接使用其结果
+        with instrument.timer('ai.level2'):
+            best_move = self.ponderer.take(self.game) if self.pondering else None
+            if best_move is not None:
+                instrument.count('ai.ponder_hit')
+            else:
+                moves = self._ranked_moves(self.game, color)
+                best_move = moves[0] if moves else None
         if best_move:
-            self.game.play_move(best_move[0], best_move[1])
-            self.game.display()
+            self._play(best_move[0], best_move[1])
+            self._display()
 
-    def evaluate_move(self, x, y, color):
-        score = 0
-        for dx, dy in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.game.board.size and 0 <= ny < self.game.board.size:
-                if self.game.board.get_color(nx, ny) != color:
-                    score += 1
-        return score
+    def _ranked_moves(self, game, color):
+        # 按评分从高到低排列的合法落子；评分结果经对称归并后存入评估缓存
+        valid_moves = self.get_valid_moves(color, game)
+        size = game.board.size
+        evaluator = self._get_evaluator()
+        position, t = position_key(game.board.grid, color, evaluator.fingerprint())
+        codes = evaluator.codes(game.board.grid)
+        scores = {}
+        for move in valid_moves:
+            key = move_key(position, t, move[0], move[1], size)
+            scores[move] = self.eval_cache.get_or_compute(
+                key, lambda: self.evaluate_move(move[0], move[1], color, codes, game))
+        return sorted(valid_moves, key=lambda m: -scores[m])
+
+    def _start_pondering(self):
+        if not self.pondering or not self.game or self.game.is_over:
+            return
+        if self.game.game_type != 'reversi' or self._current_AI_player():
+            return
+        ai_color = Board.WHITE if self.game.current_player == Board.BLACK else Board.BLACK
+        level = self.player_black if ai_color == Board.BLACK else self.player_white
+        if level == 2:
+            self.ponderer.start(self.game, ai_color)
 
-    def get_valid_moves(self, color):
+    def set_journal(self, args):
+        if len(args) != 2:
+            self._error("指令格式错误")
+            return
+        self._close_journal()
+        if args[1] == 'off':
+            print("日志记录已关闭")
+            return
+        if not self.game:
+            self._error("游戏未开始")
+            return
+        from lab01.wal import MoveLog
+        self.journal = MoveLog(args[1], self.game)
+        self.journal.checkpoint()
+        print(f"对局将记录至 {args[1]}")
+
+    def recover(self, args):
+        if len(args) != 2:
+            self._error("指令格式错误")
+            return
+        from lab01.wal import MoveLog, recover
+        self._close_journal()
+        self.game, seq = recover(args[1])
+        self.journal = MoveLog(args[1], self.game, seq)
+        print(f"已从 {args[1]} 恢复对局（共 {seq} 条记录）")
+        self._display()
+
+    def _new_journal_session(self):
+        # 更换对局后在同一文件上重新开始记录，并立即写一个检查点
+        if self.journal:
+            from lab01.wal import MoveLog
+            path = self.journal.path
+            self.journal.close()
+            self.journal = MoveLog(path, self.game)
+            self.journal.checkpoint()
+
+    def _close_journal(self):
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def analyze(self, args):
+        # analyze <filename> [output] [budget <秒>] [weights <filename|default>]
+        if len(args) < 2:
+            self._error("指令格式错误")
+            return
+        options = args[2:]
+        output = options.pop(0) if len(options) % 2 else None
+        budget = None
+        weights = self.weights_file
+        for name, value in zip(options[::2], options[1::2]):
+            if name == 'budget':
+                try:
+                    budget = float(value)
+                except ValueError:
+                    self._error("时间预算必须是数字")
+                    return
+            elif name == 'weights':
+                weights = None if value == 'default' else value
+            else:
+                self._error("指令格式错误")
+                return
+        from lab01.analyze import analyze_file, print_summary
+        output, summary = analyze_file(args[1], output, budget=budget, weights=weights)
+        print_summary(summary)
+        print(f"分析结果已写入 {output}")
+
+    def set_pondering(self, args):
+        if len(args) != 2 or args[1] not in ('on', 'off'):
+            self._error("指令格式错误")
+            return
+        self.pondering = args[1] == 'on'
+        print(f"后台思考已{'开启' if self.pondering else '关闭'}")
+
+    def _get_evaluator(self):
+        # 黑白棋模式评估表较大，第一次用到AI时才构建；
+        # 设置 LAB01_REVERSI_WEIGHTS=<文件名> 时使用 reversi_eval fit 拟合出的权重
+        if self.evaluator is None:
+            from lab01.reversi_eval import PatternEvaluator, default_evaluator
+            path = self.weights_file
+            self.evaluator = PatternEvaluator.load(path) if path else default_evaluator()
+        return self.evaluator
+
+    def set_weights(self, args):
+        if len(args) != 2:
+            self._error("指令格式错误")
+            return
+        from lab01.reversi_eval import PatternEvaluator, default_evaluator
+        if args[1] == 'default':
+            evaluator = default_evaluator()
+        else:
+            try:
+                evaluator = PatternEvaluator.load(args[1])
+            except (OSError, ValueError, KeyError):
+                self._error("无法读取权重文件")
+                return
+        self.ponderer.stop()
+        self.ponderer.results = {}
+        self.evaluator = evaluator
+        self.weights_file = None if args[1] == 'default' else args[1]
+        # 缓存键带有权重摘要，旧权重的条目不会再命中，这里只是及早腾出进程内缓存
+        self.eval_cache.clear()
+        print("黑白棋评估权重已" + ("恢复默认" if args[1] == 'default' else f"从 {args[1]} 读取"))
+
+    def evaluate_move(self, x, y, color, codes=None, game=None):
+        # 用边、角、对角线模式表加行动力和稳定子评估落子后的局面
+        instrument.count('ai.evaluate_move')
+        return self._get_evaluator().score_move(game or self.game, x, y, color, codes)
+
+    def get_valid_moves(self, color, game=None):
+        game = game or self.game
         valid_moves = []
-        for x in range(self.game.board.size):
-            for y in range(self.game.board.size):
-                if self.game.board.is_empty(x, y) and self.game._is_valid_move(x, y, color):
+        for x in range(game.board.size):
+            for y in range(game.board.size):
+                if game.board.is_empty(x, y) and game._is_valid_move(x, y, color):
                     valid_moves.append((x, y))
         return valid_moves
 
+    def stats(self, args):
+        if len(args) == 1:
+            print(f"性能统计：{'开启' if instrument.enabled else '关闭'}")
+            print(instrument.format_stats())
+            cache = self.eval_cache.stats()
+            print(f"评估缓存：{cache['size']}/{cache['capacity']} 条，命中 {cache['hits']}，"
+                  f"共享命中 {cache['shared_hits']}，未命中 {cache['misses']}，"
+                  f"淘汰 {cache['evictions']}，命中率 {cache['hit_rate']:.1%}")
+        elif args[1] == 'on':
+            instrument.enable()
+            print("性能统计已开启")
+        elif args[1] == 'off':
+            instrument.disable()
+            print("性能统计已关闭")
+        elif args[1] == 'reset':
+            instrument.reset()
+            print("性能统计已清零")
+        elif args[1] == 'dump' and len(args) == 3:
+            instrument.dump(args[2])
+            print(f"性能统计已导出至 {args[2]}")
+        else:
+            self._error("指令格式错误")
+
     def set_prompt(self, args):
         self.show_prompt = True
 
@@ -303,15 +595,16 @@ class Client:
     def login(self, args):
         color = args[1].lower()
         if color != 'black' and color != 'white':
-            print("invalid color")
+            self._error("invalid color")
             return
         username = input("请输入用户名: ").strip()
         password = input("请输入密码: ").strip()
         try:
+            self.account_manager.login(username, password)
             if color == 'black':
-                self.user1 = self.account_manager.login(username, password)
+                self.user1 = username
             else:
-                self.user2 = self.account_manager.login(username, password)
+                self.user2 = username
             print(f"欢迎回来，{username}！")
         except ValueError as e:
             print(e)
@@ -328,6 +621,22 @@ class Client:
             return
 
 
-if __name__ == '__main__':
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="五子棋、围棋和黑白棋客户端")
+    parser.add_argument('--script', metavar='FILE', help="脚本模式：从文件（- 为标准输入）读取指令")
+    parser.add_argument('--no-display', action='store_true', help="脚本模式下不在每条指令后显示棋盘")
+    parser.add_argument('--json', action='store_true', help="脚本模式下每条指令输出一行JSON")
+    args = parser.parse_args(argv)
+
     client = Client()
-    client.start()
+    if args.script is None:
+        client.start()
+        return 0
+    if args.script == '-':
+        return client.run_script(sys.stdin, not args.no_display, args.json)
+    with open(args.script, 'r', encoding='utf-8') as f:
+        return client.run_script(f, not args.no_display, args.json)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
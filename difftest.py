@@ -0,0 +1,487 @@
+import argparse
+import contextlib
+import copy
+import importlib.util
+import io
+import random
+
+from lab01.batch_check import game_winner
+from lab01.board import Board
+from lab01.record import iter_records
+from lab01.registry import get_game_class
+
+# 参考引擎是逐步校验规则的 play_move；被测引擎各自实现 play/state，
+# state 只返回它能给出的字段，与参考引擎同名字段逐步比较。
+
+
+def _grid(game):
+    return tuple(tuple(row) for row in game.board.grid)
+
+
+def _score(game):
+    if game.game_type == 'go':
+        black, white = game._count_territory()
+        return black + game.captured_stones[Board.BLACK], white + game.captured_stones[Board.WHITE]
+    if game.game_type == 'reversi':
+        return (sum(row.count(Board.BLACK) for row in game.board.grid),
+                sum(row.count(Board.WHITE) for row in game.board.grid))
+    return None
+
+
+def _try_move(game, x, y):
+    # 在副本上试走一步：合法返回 None，否则返回 'ko' 或 'illegal'
+    trial = copy.copy(game)
+    trial.move_history = list(game.move_history)
+    if game.game_type == 'go':
+        trial.previous_boards = list(game.previous_boards)
+        trial.captured_stones = dict(game.captured_stones)
+    trial.board = game.board.copy()
+    if game.game_type == 'reversi':
+        trial.flip_history = list(game.flip_history)
+    try:
+        trial.play_move(x, y)
+    except ValueError as e:
+        return 'ko' if '劫' in str(e) else 'illegal'
+    return None
+
+
+def _legal_and_ko(game):
+    legal = set()
+    ko = set()
+    if game.is_over:
+        return frozenset(), frozenset()
+    size = game.board.size
+    for y in range(size):
+        for x in range(size):
+            if not game.board.is_empty(x, y):
+                continue
+            if game.game_type == 'reversi':
+                if game._is_valid_move(x, y, game.current_player):
+                    legal.add((x, y))
+            elif game.game_type == 'gomoku':
+                legal.add((x, y))
+            else:
+                reason = _try_move(game, x, y)
+                if reason is None:
+                    legal.add((x, y))
+                elif reason == 'ko':
+                    ko.add((x, y))
+    return frozenset(legal), frozenset(ko)
+
+
+def _winning_squares(game):
+    # 逐点扫描：落子后任一方向连成五子及以上
+    size = game.board.size
+    grid = game.board.grid
+    wins = {Board.BLACK: set(), Board.WHITE: set()}
+    for y in range(size):
+        for x in range(size):
+            if grid[y][x] != Board.EMPTY:
+                continue
+            for player in (Board.BLACK, Board.WHITE):
+                for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                    count = 1
+                    for sign in (1, -1):
+                        nx, ny = x + sign * dx, y + sign * dy
+                        while 0 <= nx < size and 0 <= ny < size and grid[ny][nx] == player:
+                            count += 1
+                            nx += sign * dx
+                            ny += sign * dy
+                    if count >= 5:
+                        wins[player].add((x, y))
+                        break
+    return {player: frozenset(points) for player, points in wins.items()}
+
+
+def _patterns(game):
+    from lab01.pattern import PatternBoard
+    board = PatternBoard(game.board.size)
+    for y, row in enumerate(game.board.grid):
+        for x, color in enumerate(row):
+            if color != Board.EMPTY:
+                board.place_stone(x, y, color)
+    return tuple(board.patterns)
+
+
+def _codes(game):
+    from lab01.reversi_eval import default_evaluator
+    return tuple(default_evaluator().codes(game.board.grid))
+
+
+def game_state(game, fields):
+    # 参考引擎的局面，只计算被测引擎用到的字段
+    state = {}
+    for field in fields:
+        if field == 'board':
+            state[field] = _grid(game)
+        elif field == 'player':
+            state[field] = game.current_player
+        elif field == 'over':
+            state[field] = game.is_over
+        elif field == 'winner':
+            state[field] = game_winner(game)
+        elif field == 'captures':
+            state[field] = dict(game.captured_stones)
+        elif field == 'score':
+            state[field] = _score(game)
+        elif field in ('legal', 'ko'):
+            state['legal'], state['ko'] = _legal_and_ko(game)
+        elif field == 'wins':
+            state[field] = _winning_squares(game)
+        elif field == 'patterns':
+            state[field] = _patterns(game)
+        elif field == 'codes':
+            state[field] = _codes(game)
+    return state
+
+
+# ---------------- 被测引擎 ----------------
+
+class ReplayEngine:
+    # 不做规则检查的快速回放路径 _fast_play / _finish_replay
+    name = 'replay'
+    game_types = ('gomoku', 'go', 'reversi')
+
+    def __init__(self, game_type, size):
+        self.game = get_game_class(game_type)(size)
+        self.fields = ['board', 'player', 'over', 'score']
+        if game_type == 'go':
+            self.fields.append('captures')
+
+    def play(self, x, y, color):
+        self.game._fast_play(x, y, color)
+        if not self.game.is_over:
+            self.game._finish_replay()
+
+    def state(self):
+        return game_state(self.game, self.fields)
+
+
+class UndoEngine:
+    # 每一步都先落子、悔棋、再落子：悔棋后的局面必须与落子前一致，再落子后与参考引擎一致。
+    # 围棋的 move_history 不记录PASS，悔棋不支持撤回PASS，PASS 时不检查悔棋
+    name = 'undo'
+    game_types = ('gomoku', 'go', 'reversi')
+
+    def __init__(self, game_type, size):
+        self.game = get_game_class(game_type)(size)
+        self.fields = ['board', 'player', 'over', 'score']
+        if game_type == 'go':
+            self.fields += ['captures', 'legal', 'ko']
+        self.undo_error = None
+
+    def play(self, x, y, color):
+        game = self.game
+        if x is not None:
+            before = game_state(game, self.fields)
+            game.play_move(x, y)
+            game.undo_move()
+            after = game_state(game, self.fields)
+            if after != before:
+                field = next(f for f in self.fields if after[f] != before[f])
+                self.undo_error = (field, before[field], after[field])
+        game.play_move(x, y)
+
+    def state(self):
+        state = game_state(self.game, self.fields)
+        if self.undo_error is not None:
+            state['undo'] = self.undo_error
+        return state
+
+
+class ThreatEngine:
+    # 五子棋连子索引：成五判定与每个空点能否成五
+    name = 'threats'
+    game_types = ('gomoku',)
+    fields = ['over', 'wins']
+
+    def __init__(self, game_type, size):
+        self.game = get_game_class(game_type)(size)
+
+    def play(self, x, y, color):
+        self.game._fast_play(x, y, color)
+
+    def state(self):
+        threats = self.game.threats
+        return {
+            'over': threats.has_five(Board.BLACK) or threats.has_five(Board.WHITE),
+            'wins': {player: frozenset(threats.winning_squares(player))
+                     for player in (Board.BLACK, Board.WHITE)},
+        }
+
+
+class PatternEngine:
+    # 围棋棋盘增量维护的3×3邻域编码
+    name = 'patterns'
+    game_types = ('go',)
+    fields = ['patterns']
+
+    def __init__(self, game_type, size):
+        self.game = get_game_class(game_type)(size)
+
+    def play(self, x, y, color):
+        self.game._fast_play(x, y, color)
+
+    def state(self):
+        return {'patterns': tuple(self.game.board.patterns)}
+
+
+class CodesEngine:
+    # 黑白棋模式评估的增量编码
+    name = 'codes'
+    game_types = ('reversi',)
+    fields = ['codes']
+
+    def __init__(self, game_type, size):
+        from lab01.reversi_eval import default_evaluator
+        self.game = get_game_class(game_type)(size)
+        self.evaluator = default_evaluator()
+        self.codes = self.evaluator.codes(self.game.board.grid)
+
+    def play(self, x, y, color):
+        flipped = self.game._place_and_flip(x, y, color)
+        self.evaluator.apply(self.codes, x, y, color, flipped)
+
+    def state(self):
+        return {'codes': tuple(self.codes)}
+
+
+class VecEngine:
+    # NumPy 批量环境中的单局；对局结束时环境立即重置，只比较是否结束和胜方。
+    # 五子棋下满棋盘时环境按平局结束，GomokuGame 没有这条规则，此时不算结束
+    name = 'vecenv'
+    game_types = ('gomoku', 'reversi')
+    fields = ['board', 'player', 'over', 'legal', 'winner']
+
+    def __init__(self, game_type, size):
+        from lab01.vecenv import NOT_OVER, VecGomoku, VecReversi
+        self.not_over = NOT_OVER
+        self.game_type = game_type
+        self.env = VecReversi(1) if game_type == 'reversi' else VecGomoku(1, size)
+        self.result = NOT_OVER
+
+    def play(self, x, y, color):
+        self.result = int(self.env.step([y * self.env.size + x])[0])
+
+    def state(self):
+        if self.result == 0 and self.game_type == 'gomoku':
+            return {'over': False}
+        if self.result == self.not_over:
+            return {
+                'board': tuple(tuple(row) for row in self.env.grid(0)),
+                'player': int(self.env.players[0]),
+                'over': False,
+                'legal': frozenset((int(x), int(y)) for x, y in self.env.legal_moves(0)),
+            }
+        return {'over': True, 'winner': self.result}
+
+
+ENGINES = [ReplayEngine, UndoEngine, ThreatEngine, PatternEngine, CodesEngine, VecEngine]
+
+
+def available_engines(names=None):
+    engines = []
+    for engine in ENGINES:
+        if names and engine.name not in names:
+            continue
+        if engine is VecEngine and importlib.util.find_spec('numpy') is None:
+            # 批量环境依赖 NumPy，未安装时跳过
+            continue
+        engines.append(engine)
+    return engines
+
+
+# ---------------- 逐步比较与缩减 ----------------
+
+def run_case(game_type, size, moves, engines):
+    # moves 中可以有会被参考引擎拒绝的尝试：参考引擎拒绝时局面必须不变，被测引擎不接收该步。
+    # 返回第一处不一致，全部一致返回 None；落子方与当前玩家不符时抛出 ValueError
+    with contextlib.redirect_stdout(io.StringIO()):
+        reference = get_game_class(game_type)(size)
+        engines = [engine(game_type, size) for engine in engines if game_type in engine.game_types]
+        fields = sorted({field for engine in engines for field in engine.fields})
+        checked = ['board', 'player', 'over', 'captures'] if game_type == 'go' else ['board', 'player', 'over']
+        for ply, (x, y, color) in enumerate(moves):
+            if reference.is_over:
+                raise ValueError("游戏已结束，仍有多余的落子")
+            if color != reference.current_player:
+                raise ValueError("落子方与当前玩家不符")
+            before = game_state(reference, checked)
+            try:
+                reference.play_move(x, y)
+            except ValueError:
+                after = game_state(reference, checked)
+                if after != before:
+                    field = next(f for f in before if after[f] != before[f])
+                    return _mismatch(game_type, size, ply, 'rejected', field, before[field], after[field])
+                continue
+            expected = game_state(reference, fields)
+            for engine in engines:
+                engine.play(x, y, color)
+                actual = engine.state()
+                for field, value in actual.items():
+                    if field == 'undo':
+                        return _mismatch(game_type, size, ply, engine.name, 'undo.' + value[0],
+                                         value[1], value[2])
+                    if expected.get(field, value) != value:
+                        return _mismatch(game_type, size, ply, engine.name, field, expected[field], value)
+    return None
+
+
+def _mismatch(game_type, size, ply, engine, field, expected, actual):
+    return {'game_type': game_type, 'size': size, 'ply': ply, 'engine': engine,
+            'field': field, 'expected': expected, 'actual': actual}
+
+
+def _recolor(game_type, size, moves):
+    # 删除一段落子后，按参考引擎重新确定每一步的落子方；游戏结束后的落子丢弃
+    result = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = get_game_class(game_type)(size)
+        for x, y, _ in moves:
+            if game.is_over:
+                break
+            result.append((x, y, game.current_player))
+            try:
+                game.play_move(x, y)
+            except ValueError:
+                pass
+    return result
+
+
+def shrink(game_type, size, moves, mismatch, engines):
+    # 先截去不一致之后的落子，再用 delta debugging 逐段删除，保留仍在同一引擎同一字段上不一致的序列；
+    # 删除后重新确定落子方，否则删掉单独一步就会打乱黑白交替。缩减时只运行出错的引擎
+    engines = [engine for engine in engines if engine.name == mismatch['engine']]
+
+    def fails(candidate):
+        try:
+            result = run_case(game_type, size, candidate, engines)
+        except ValueError:
+            return False
+        return (result is not None and result['engine'] == mismatch['engine']
+                and result['field'] == mismatch['field'])
+
+    moves = list(moves[:mismatch['ply'] + 1])
+    n = 2
+    while len(moves) >= 2:
+        chunk = -(-len(moves) // n)
+        for start in range(0, len(moves), chunk):
+            candidate = _recolor(game_type, size, moves[:start] + moves[start + chunk:])
+            if fails(candidate):
+                moves = candidate
+                n = max(n - 1, 2)
+                break
+        else:
+            if chunk == 1:
+                break
+            n = min(n * 2, len(moves))
+    return moves
+
+
+# ---------------- 生成对局 ----------------
+
+def random_moves(game_type, size, rng, max_plies=None, illegal_rate=0.05):
+    # 用参考引擎随机对弈，偶尔尝试非法落子（已有棋子、自杀、不能翻转）；
+    # 围棋刚被提掉的点有一半概率立即回提，以便经常遇到劫
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = get_game_class(game_type)(size)
+        moves = []
+        captured = []
+        max_plies = max_plies or size * size * 2
+        while not game.is_over and len(moves) < max_plies:
+            color = game.current_player
+            empties = [(x, y) for y in range(size) for x in range(size) if game.board.is_empty(x, y)]
+            if game_type == 'go' and (not empties or rng.random() < (len(moves) - size * size) / (size * size)):
+                game.play_move(None, None)
+                moves.append((None, None, color))
+                continue
+            if not empties:
+                break
+            if captured and rng.random() < 0.5:
+                empties = captured
+            elif game_type == 'reversi' and rng.random() >= illegal_rate:
+                empties = [(x, y) for x, y in empties if game._is_valid_move(x, y, color)]
+            elif rng.random() < illegal_rate and game.move_history:
+                empties = [game.move_history[-1][:2]]
+            x, y = rng.choice(empties)
+            moves.append((x, y, color))
+            before = _grid(game)
+            try:
+                game.play_move(x, y)
+            except ValueError:
+                continue
+            if game_type == 'go':
+                after = game.board.grid
+                captured = [(cx, cy) for cy in range(size) for cx in range(size)
+                            if before[cy][cx] != Board.EMPTY and after[cy][cx] == Board.EMPTY]
+        if game_type == 'go' and not game.is_over:
+            for _ in range(2):
+                moves.append((None, None, game.current_player))
+                game.play_move(None, None)
+    return moves
+
+
+def iter_cases(game_types, sizes, games, seed=None, files=()):
+    rng = random.Random(seed)
+    for filename in files:
+        for index, record in enumerate(iter_records(filename)):
+            if record.setup or record.first_player != Board.BLACK:
+                # 各引擎都从空棋盘开始比较，带摆子的棋谱（如让子棋）不参与
+                continue
+            yield f"{filename}#{index}", record.game_type, record.size, record.moves
+    for i in range(games):
+        game_type = game_types[i % len(game_types)]
+        size = 8 if game_type == 'reversi' else sizes[game_type]
+        yield f"random#{i}", game_type, size, random_moves(game_type, size, rng)
+
+
+def run(cases, engines, max_failures=5):
+    failures = []
+    count = 0
+    for source, game_type, size, moves in cases:
+        count += 1
+        mismatch = run_case(game_type, size, moves, engines)
+        if mismatch is None:
+            continue
+        mismatch['source'] = source
+        mismatch['moves'] = shrink(game_type, size, moves, mismatch, engines)
+        failures.append(mismatch)
+        if len(failures) >= max_failures:
+            break
+    return count, failures
+
+
+def format_failure(failure):
+    moves = ' '.join('pass' if x is None else f"{'B' if c == Board.BLACK else 'W'}({x},{y})"
+                     for x, y, c in failure['moves'])
+    return (f"[{failure['game_type']} {failure['size']}] {failure['source']} 第{failure['ply']}手 "
+            f"引擎 {failure['engine']} 字段 {failure['field']}\n"
+            f"  参考：{failure['expected']!r}\n  实际：{failure['actual']!r}\n"
+            f"  最小复现（{len(failure['moves'])} 手）：{moves}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="参考规则引擎与快速引擎的逐步差分测试")
+    parser.add_argument('files', nargs='*', help="额外检查的棋谱文件")
+    parser.add_argument('-n', '--games', type=int, default=30, help="随机对局数")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--types', nargs='+', default=['gomoku', 'go', 'reversi'],
+                        choices=['gomoku', 'go', 'reversi'])
+    parser.add_argument('--go-size', type=int, default=9)
+    parser.add_argument('--gomoku-size', type=int, default=15)
+    parser.add_argument('--engines', nargs='+', help="只运行指定的被测引擎")
+    args = parser.parse_args(argv)
+
+    engines = available_engines(args.engines)
+    sizes = {'go': args.go_size, 'gomoku': args.gomoku_size}
+    cases = iter_cases(args.types, sizes, args.games, args.seed, args.files)
+    count, failures = run(cases, engines)
+    for failure in failures:
+        print(format_failure(failure))
+    print(f"共检查 {count} 局，引擎：{', '.join(e.name for e in engines)}，不一致 {len(failures)} 处")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+import operator
+import os
+import struct
+from collections import OrderedDict
+
+# 正方形棋盘的8种对称变换，(x, y) -> 变换后的坐标，n = size - 1
+TRANSFORMS = [
+    lambda x, y, n: (x, y),
+    lambda x, y, n: (n - x, y),
+    lambda x, y, n: (x, n - y),
+    lambda x, y, n: (n - x, n - y),
+    lambda x, y, n: (y, x),
+    lambda x, y, n: (n - y, x),
+    lambda x, y, n: (y, n - x),
+    lambda x, y, n: (n - y, n - x),
+]
+INVERSE = [0, 1, 2, 3, 4, 6, 5, 7]
+
+_permutations = {}
+
+
+def _getters(size):
+    # 每种变换对应一个 itemgetter，把展平的棋盘一次性重排成变换后的顺序
+    getters = _permutations.get(size)
+    if getters is None:
+        getters = []
+        for transform in TRANSFORMS:
+            perm = [0] * (size * size)
+            for y in range(size):
+                for x in range(size):
+                    tx, ty = transform(x, y, size - 1)
+                    perm[ty * size + tx] = y * size + x
+            getters.append(operator.itemgetter(*perm))
+        _permutations[size] = getters
+    return getters
+
+
+def position_key(grid, color, tag=b''):
+    # 取8种对称局面中字节序最小的一种作为键，同时返回所用的变换编号；
+    # tag 区分不同的评估函数，共享表里不同权重算出的分数互不混用
+    size = len(grid)
+    flat = [cell for row in grid for cell in row]
+    best = None
+    best_t = 0
+    for t, getter in enumerate(_getters(size)):
+        candidate = bytes(getter(flat))
+        if best is None or candidate < best:
+            best = candidate
+            best_t = t
+    return tag + bytes((color,)) + best, best_t
+
+
+def transform_point(t, x, y, size):
+    return TRANSFORMS[t](x, y, size - 1)
+
+
+def inverse_point(t, x, y, size):
+    return TRANSFORMS[INVERSE[t]](x, y, size - 1)
+
+
+def move_key(position, t, x, y, size):
+    tx, ty = transform_point(t, x, y, size)
+    return position + bytes((tx, ty))
+
+
+class SharedTable:
+    # 多进程共享的内存映射表：直接映射、新值覆盖旧值。
+    # 每个槽位存 (键哈希 ^ 数据, 数据)，读到被并发写坏的槽位时校验失败，按未命中处理。
+    SLOT = struct.Struct('<QQ')
+
+    def __init__(self, path, slots=1 << 20):
+        import mmap
+        self.path = path
+        self.slots = slots
+        size = slots * self.SLOT.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def hash_key(key):
+        import hashlib
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') | 1
+
+    def get(self, key):
+        h = self.hash_key(key)
+        check, data = self.SLOT.unpack_from(self.map, (h % self.slots) * self.SLOT.size)
+        if check ^ data != h:
+            return None
+        return struct.unpack('<d', struct.pack('<Q', data))[0]
+
+    def put(self, key, value):
+        h = self.hash_key(key)
+        data = struct.unpack('<Q', struct.pack('<d', value))[0]
+        self.SLOT.pack_into(self.map, (h % self.slots) * self.SLOT.size, h ^ data, data)
+
+    def close(self):
+        self.map.close()
+
+
+class EvalCache:
+    # 进程内 LRU 缓存，可选再叠加一层多进程共享的内存映射表
+    def __init__(self, capacity=100000, path=None, slots=1 << 20):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.shared = SharedTable(path, slots) if path else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.shared_hits += 1
+                self._store(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.put(key, value)
+
+    def _store(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
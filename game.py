@@ -1,23 +1,49 @@
-import sys
-import pickle
-import copy
+from lab01 import instrument
 from lab01.board import Board
+from lab01.pattern import PatternBoard, pattern_weight
 
 
 class Game:
+    game_type = None
+    board_class = Board
+    # 摆子（如让子棋的让子）：(x, y, color)，color 为 EMPTY 表示清空该点；重新开始和悔棋时保留
+    setup = ()
+    first_player = Board.BLACK
+
     def __init__(self, board_size):
-        self.board = Board(board_size)
+        self.board = self.board_class(board_size)
         self.current_player = Board.BLACK
         self.move_history = []
         self.is_over = False
         self.replay_steps = []
 
     def restart(self):
-        self.board = Board(self.board.size)
-        self.current_player = Board.BLACK
+        self.board = self.board_class(self.board.size)
+        self._initialize_board()
+        self._apply_setup()
+        self.current_player = self.first_player
         self.move_history.clear()
         self.is_over = False
 
+    def set_setup(self, stones, first_player=Board.BLACK):
+        # 设置摆子和先手方并重新开始
+        self.setup = list(stones)
+        self.first_player = first_player
+        self.restart()
+
+    def _initialize_board(self):
+        pass
+
+    def _apply_setup(self):
+        board = self.board
+        for x, y, color in self.setup:
+            if not (0 <= x < board.size and 0 <= y < board.size):
+                raise ValueError("摆子位置超出棋盘范围")
+            if not board.is_empty(x, y):
+                board.remove_stone(x, y)
+            if color != Board.EMPTY:
+                board.place_stone(x, y, color)
+
     def switch_player(self):
         self.current_player = Board.WHITE if self.current_player == Board.BLACK else Board.BLACK
 
@@ -33,16 +59,20 @@ class Game:
     def undo_move(self):
         if not self.move_history:
             raise ValueError("没有棋子可悔")
-        x, y, _ = self.move_history.pop()
+        x, y, color = self.move_history.pop()
         self.board.remove_stone(x, y)
-        self.switch_player()
+        # 悔掉的可能是获胜的一步：恢复为未结束，轮到被悔棋的一方
+        self.current_player = color
+        self.is_over = False
 
     def save_game(self, filename):
+        import pickle
         with open(filename, 'wb') as f:
             pickle.dump(self, f)
 
     @staticmethod
     def load_game(filename):
+        import pickle
         with open(filename, 'rb') as f:
             game = pickle.load(f)
         return game
@@ -55,16 +85,94 @@ class Game:
         return '黑棋' if player == Board.BLACK else '白棋'
 
     def display(self):
-        print(f"当前玩家: {self._player_repr(self.current_player)}")
-        self.board.display()
+        with instrument.timer('display'):
+            print(f"当前玩家: {self._player_repr(self.current_player)}")
+            self.board.display()
 
     def replay_game(self):
         for x, y, player in self.move_history:
             self.board.place_stone(x, y, player)
             self.display()
 
+    def replay_moves(self, moves, validate=True):
+        # validate为True时逐步调用play_move检查规则，否则走不做合法性检查的快速回放
+        for x, y, color in moves:
+            if self.is_over:
+                raise ValueError("游戏已结束，棋谱中仍有多余的落子")
+            if validate:
+                if color != self.current_player:
+                    raise ValueError("棋谱中的落子方与当前玩家不符")
+                self.play_move(x, y)
+            else:
+                self._fast_play(x, y, color)
+        if not validate:
+            self._finish_replay()
+
+    def _fast_play(self, x, y, color):
+        self.board.grid[y][x] = color
+        self.move_history.append((x, y, color))
+        self.current_player = color
+        if self.check_win(x, y):
+            self.is_over = True
+        else:
+            self.switch_player()
+
+    def _finish_replay(self):
+        pass
+
 class GomokuGame(Game):
+    game_type = 'gomoku'
+
+    def __init__(self, board_size):
+        super().__init__(board_size)
+        self._reset_threats()
+
+    def _reset_threats(self):
+        self._threats = None
+        self._indexed = 0
+
+    @property
+    def threats(self):
+        # 连子索引按需追上落子记录：不查询时不增加落子开销，查询时每步 O(1) 增量更新
+        if self._threats is None:
+            from lab01.threat import ThreatIndex
+            self._threats = ThreatIndex(self.board.size)
+            stones = {(x, y): color for x, y, color in self.setup}
+            for (x, y), color in stones.items():
+                if color != Board.EMPTY:
+                    self._threats.place(x, y, color)
+        while self._indexed < len(self.move_history):
+            x, y, color = self.move_history[self._indexed]
+            self._threats.place(x, y, color)
+            self._indexed += 1
+        return self._threats
+
+    def restart(self):
+        super().restart()
+        self._reset_threats()
+
+    def undo_move(self):
+        super().undo_move()
+        if self._indexed > len(self.move_history):
+            self._threats.undo()
+            self._indexed -= 1
+
+    def __getstate__(self):
+        # 连子索引不写入存档，读档后按落子记录重建
+        state = self.__dict__.copy()
+        state.pop('_threats', None)
+        state.pop('_indexed', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_threats()
+
+    def winning_squares(self, player):
+        return self.threats.winning_squares(player)
+
     def check_win(self, x, y):
+        instrument.count('gomoku.check_win')
         directions = [(1,0), (0,1), (1,1), (1,-1)]
         for dx, dy in directions:
             count = 1
@@ -85,12 +193,37 @@ class GomokuGame(Game):
         return count
 
 class GoGame(Game):
+    game_type = 'go'
+    # 围棋棋盘增量维护每个点的3×3邻域编码，供走子策略按表查权重
+    board_class = PatternBoard
+
     def __init__(self, board_size):
         super().__init__(board_size)
         self.pass_count = 0
         self.previous_boards = []
         self.captured_stones = {Board.BLACK: 0, Board.WHITE: 0}
 
+    def restart(self):
+        super().restart()
+        self.pass_count = 0
+        self.captured_stones = {Board.BLACK: 0, Board.WHITE: 0}
+        self.previous_boards = self._initial_boards()
+
+    def _initial_boards(self):
+        # 摆子后的局面也不能再次出现；空棋盘不会因落子重现，不必记录
+        return [self._board_snapshot()] if self.setup else []
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not isinstance(self.board, self.board_class):
+            # 旧存档中是普通 Board，按棋盘内容重建邻域编码
+            board = self.board_class(self.board.size)
+            for y, row in enumerate(self.board.grid):
+                for x, color in enumerate(row):
+                    if color != Board.EMPTY:
+                        board.place_stone(x, y, color)
+            self.board = board
+
     def play_move(self, x, y):
         if x is None and y is None:
             self.pass_count += 1
@@ -107,21 +240,26 @@ class GoGame(Game):
             raise ValueError("该位置已有棋子")
 
         # 创建棋盘副本以检查合法性
-        temp_board = copy.deepcopy(self.board)
-        temp_board.place_stone(x, y, self.current_player)
+        with instrument.timer('go.placement'):
+            temp_board = self.board.copy()
+            temp_board.place_stone(x, y, self.current_player)
 
         # 检查是否有提子
         opponent = Board.WHITE if self.current_player == Board.BLACK else Board.BLACK
-        captured = self._remove_dead_stones(temp_board, x, y, opponent)
+        with instrument.timer('go.capture'):
+            captured = self._remove_dead_stones(temp_board, x, y, opponent)
 
-        # 检查自己的棋子是否有气
-        if not self._has_liberty(temp_board, x, y, self.current_player):
-            if not captured:
-                raise ValueError("不能自杀")
+            # 检查自己的棋子是否有气
+            if not self._has_liberty(temp_board, x, y, self.current_player):
+                if not captured:
+                    raise ValueError("不能自杀")
 
         # 检查是否形成劫
-        if self._is_ko(temp_board):
-            raise ValueError("不能下出与之前棋盘相同的局面（劫）")
+        with instrument.timer('go.ko'):
+            if self._is_ko(temp_board):
+                # 提子数已在 _remove_dead_stones 中累加，被拒绝的落子不能计入
+                self.captured_stones[self.current_player] -= len(captured)
+                raise ValueError("不能下出与之前棋盘相同的局面（劫）")
 
         # 更新真实棋盘和状态
         self.board = temp_board
@@ -130,6 +268,24 @@ class GoGame(Game):
         self.pass_count = 0
         self.switch_player()
 
+    def _fast_play(self, x, y, color):
+        if x is None and y is None:
+            self.pass_count += 1
+            self.current_player = color
+            if self.pass_count >= 2:
+                self.is_over = True
+            else:
+                self.switch_player()
+            return
+        self.current_player = color
+        self.board.place_stone(x, y, color)
+        opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+        self._remove_dead_stones(self.board, x, y, opponent)
+        self.move_history.append((x, y, color))
+        self.previous_boards.append(self._board_snapshot())
+        self.pass_count = 0
+        self.switch_player()
+
     def _has_liberty(self, board, x, y, color):
         visited = set()
         return self._search_liberty(board, x, y, color, visited)
@@ -202,6 +358,10 @@ class GoGame(Game):
         return res
 
     def _count_territory(self):
+        with instrument.timer('go.scoring'):
+            return self._count_territory_impl()
+
+    def _count_territory_impl(self):
         visited = set()
         black_territory = 0
         white_territory = 0
@@ -240,29 +400,86 @@ class GoGame(Game):
     def undo_move(self):
         if not self.move_history:
             raise ValueError("没有棋子可悔")
-        self.move_history.pop()
-        if self.previous_boards:
-            self.previous_boards.pop()
-        self.board = Board(self.board.size)
+        _, _, player = self.move_history.pop()
+        moves = self.move_history
+        # 重新回放剩余棋步（含提子），悔棋后轮到被悔棋的一方
+        self.board = self.board_class(self.board.size)
+        self._apply_setup()
         self.captured_stones = {Board.BLACK: 0, Board.WHITE: 0}
-        for move in self.move_history:
-            x, y, color = move
-            self.board.place_stone(x, y, color)
-        self.switch_player()
+        self.move_history = []
+        self.previous_boards = self._initial_boards()
+        for x, y, color in moves:
+            self._fast_play(x, y, color)
+        self.current_player = player
         self.pass_count = 0
 
+    def pattern_weight(self, x, y, color=None):
+        if color is None:
+            color = self.current_player
+        return pattern_weight(self.board.pattern(x, y), color)
+
+    def candidate_weights(self, color=None):
+        # 所有空点及其模式权重，走子策略每个点只需一次查表
+        if color is None:
+            color = self.current_player
+        board = self.board
+        size = board.size
+        return [((i % size, i // size), pattern_weight(code, color))
+                for i, code in enumerate(board.patterns)
+                if board.grid[i // size][i % size] == Board.EMPTY]
+
+    def is_legal(self, x, y, color=None):
+        # 在棋盘副本上试下，不改变对局状态：不能自杀，不能重复之前的局面（劫）
+        if color is None:
+            color = self.current_player
+        if not (0 <= x < self.board.size and 0 <= y < self.board.size) or not self.board.is_empty(x, y):
+            return False
+        board = self.board.copy()
+        board.place_stone(x, y, color)
+        opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+        captured = False
+        for nx, ny in board.get_neighbors(x, y):
+            if board.get_color(nx, ny) == opponent and not self._has_liberty(board, nx, ny, opponent):
+                group = []
+                self._collect_group(board, nx, ny, opponent, group)
+                for sx, sy in group:
+                    board.remove_stone(sx, sy)
+                captured = True
+        if not captured and not self._has_liberty(board, x, y, color):
+            return False
+        return not self._is_ko(board)
+
     def display(self):
-        print(f"当前玩家: {self._player_repr(self.current_player)}")
-        print(f"黑棋提子数：{self.captured_stones[Board.BLACK]}，白棋提子数：{self.captured_stones[Board.WHITE]}")
-        self.board.display()
+        with instrument.timer('display'):
+            print(f"当前玩家: {self._player_repr(self.current_player)}")
+            print(f"黑棋提子数：{self.captured_stones[Board.BLACK]}，白棋提子数：{self.captured_stones[Board.WHITE]}")
+            self.board.display()
 
 class Reversi(Game):
+    game_type = 'reversi'
+
     def __init__(self, board_size=8):
         if board_size != 8:
             print("黑白棋棋盘大小只能为8*8")
             board_size = 8
         super().__init__(board_size)
         self._initialize_board()
+        # 每一步翻转的棋子，悔棋时据此恢复
+        self.flip_history = []
+
+    def restart(self):
+        super().restart()
+        self.flip_history = []
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'flip_history' not in state:
+            # 旧存档没有翻转记录：按落子记录重新回放一遍得到，悔棋仍可退回开局
+            replay = type(self)(self.board.size)
+            replay.set_setup(self.setup, self.first_player)
+            for x, y, color in self.move_history:
+                replay._fast_play(x, y, color)
+            self.flip_history = replay.flip_history
 
     def _initialize_board(self):
         mid = self.board.size // 2
@@ -275,8 +492,9 @@ class Reversi(Game):
         if not self._is_valid_move(x, y, self.current_player):
             raise ValueError("无效的落子位置")
 
-        self._place_and_flip(x, y, self.current_player)
+        flipped = self._place_and_flip(x, y, self.current_player)
         self.move_history.append((x, y, self.current_player))
+        self.flip_history.append(flipped)
 
         if not self._has_valid_moves(self._opponent_color(self.current_player)):
             if not self._has_valid_moves(self.current_player):
@@ -287,6 +505,19 @@ class Reversi(Game):
         else:
             self.switch_player()
 
+    def _fast_play(self, x, y, color):
+        self.flip_history.append(self._place_and_flip(x, y, color))
+        self.move_history.append((x, y, color))
+        self.current_player = self._opponent_color(color)
+
+    def _finish_replay(self):
+        # 快速回放时只在末尾判断一次轮空与终局
+        if self._has_valid_moves(self.current_player):
+            return
+        self.switch_player()
+        if not self._has_valid_moves(self.current_player):
+            self.is_over = True
+
     def _is_valid_move(self, x, y, color):
         if not (0 <= x < self.board.size and 0 <= y < self.board.size) or not self.board.is_empty(x, y):
             return False
@@ -310,16 +541,21 @@ class Reversi(Game):
         return False
 
     def _place_and_flip(self, x, y, color):
-        self.board.place_stone(x, y, color)
-        for dx, dy in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]:
-            if self._can_capture_in_direction(x, y, dx, dy, color):
-                self._flip_in_direction(x, y, dx, dy, color)
+        # 返回被翻转的棋子坐标列表
+        with instrument.timer('reversi.flip'):
+            self.board.place_stone(x, y, color)
+            flipped = []
+            for dx, dy in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]:
+                if self._can_capture_in_direction(x, y, dx, dy, color):
+                    self._flip_in_direction(x, y, dx, dy, color, flipped)
+            return flipped
 
-    def _flip_in_direction(self, x, y, dx, dy, color):
+    def _flip_in_direction(self, x, y, dx, dy, color, flipped):
         x, y = x + dx, y + dy
         while 0 <= x < self.board.size and 0 <= y < self.board.size:
             if self.board.get_color(x, y) == self._opponent_color(color):
                 self.board.grid[y][x] = color
+                flipped.append((x, y))
             elif self.board.get_color(x, y) == color:
                 break
             x, y = x + dx, y + dy
@@ -328,6 +564,7 @@ class Reversi(Game):
         return Board.BLACK if color == Board.WHITE else Board.WHITE
 
     def _has_valid_moves(self, color):
+        instrument.count('reversi.has_valid_moves')
         for x in range(self.board.size):
             for y in range(self.board.size):
                 if self._is_valid_move(x, y, color):
@@ -355,19 +592,10 @@ class Reversi(Game):
         self.board.remove_stone(x, y)
 
         # 恢复被翻转的棋子
-        for dx, dy in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]:
-            self._undo_flip_in_direction(x, y, dx, dy, color)
-
-        # 切换回对方玩家
-        self.switch_player()
+        opponent = self._opponent_color(color)
+        for fx, fy in self.flip_history.pop():
+            self.board.grid[fy][fx] = opponent
 
-    def _undo_flip_in_direction(self, x, y, dx, dy, color):
-        # 先找出被翻转的棋子，然后恢复
-        x, y = x + dx, y + dy
-        while 0 <= x < self.board.size and 0 <= y < self.board.size:
-            if self.board.get_color(x, y) == self._opponent_color(color):
-                # 恢复为对方棋子
-                self.board.grid[y][x] = self._opponent_color(color)
-            elif self.board.get_color(x, y) == color:
-                break
-            x, y = x + dx, y + dy
+        # 轮回悔棋的一方（中间可能有轮空），悔掉终局的一步后对局继续
+        self.current_player = color
+        self.is_over = False
@@ -0,0 +1,48 @@
+import sys
+
+from lab01 import registry
+
+USAGE = "用法：python -m lab01.headless <game_type> <board_size> [落子文件，默认读标准输入]"
+
+
+def play(game_type, board_size, lines):
+    # 无界面对局：每行一个落子 "x y" 或 "pass"，只导入所选游戏需要的模块
+    game = registry.create_game(game_type, board_size)
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if game.is_over:
+            raise ValueError(f"第{lineno}行：游戏已结束")
+        try:
+            if line.lower() == 'pass':
+                game.play_move(None, None)
+            else:
+                x, y = map(int, line.split())
+                game.play_move(x, y)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"第{lineno}行：{e}") from None
+    return game
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (2, 3):
+        print(USAGE, file=sys.stderr)
+        return 2
+    game_type, board_size = argv[0], int(argv[1])
+    try:
+        if len(argv) == 3:
+            with open(argv[2], 'r', encoding='utf-8') as f:
+                game = play(game_type, board_size, f)
+        else:
+            game = play(game_type, board_size, sys.stdin)
+    except ValueError as e:
+        print(f"发生错误：{e}", file=sys.stderr)
+        return 1
+    game.display()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import atexit
+import os
+import time
+
+# 默认关闭；关闭时 timer() 返回共享的空计时器，count() 只做一次判断
+enabled = False
+counters = {}
+histograms = {}
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def timer(name):
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def count(name, n=1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + n
+
+
+def record(name, seconds):
+    # 直方图按微秒的2的幂分桶：桶k表示耗时在[2^(k-1), 2^k)微秒之间
+    hist = histograms.get(name)
+    if hist is None:
+        hist = histograms[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'buckets': {}}
+    hist['count'] += 1
+    hist['total'] += seconds
+    if seconds > hist['max']:
+        hist['max'] = seconds
+    bucket = int(seconds * 1e6).bit_length()
+    hist['buckets'][bucket] = hist['buckets'].get(bucket, 0) + 1
+
+
+def reset():
+    counters.clear()
+    histograms.clear()
+
+
+def snapshot():
+    return {
+        'counters': dict(counters),
+        'timers': {name: {'count': h['count'], 'total': h['total'], 'max': h['max'],
+                          'buckets': {str(k): v for k, v in sorted(h['buckets'].items())}}
+                   for name, h in histograms.items()},
+    }
+
+
+def take():
+    data = snapshot()
+    reset()
+    return data
+
+
+def merge(data):
+    # 合并其他进程用 snapshot()/take() 取出的统计数据
+    for name, n in data['counters'].items():
+        counters[name] = counters.get(name, 0) + n
+    for name, h in data['timers'].items():
+        hist = histograms.get(name)
+        if hist is None:
+            hist = histograms[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'buckets': {}}
+        hist['count'] += h['count']
+        hist['total'] += h['total']
+        hist['max'] = max(hist['max'], h['max'])
+        for k, v in h['buckets'].items():
+            hist['buckets'][int(k)] = hist['buckets'].get(int(k), 0) + v
+
+
+def dump(filename):
+    import json
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, indent=4)
+
+
+def format_stats():
+    lines = []
+    for name, h in sorted(histograms.items()):
+        mean = h['total'] / h['count'] * 1e6 if h['count'] else 0.0
+        lines.append(f"{name:24} 次数 {h['count']:8}  总计 {h['total'] * 1e3:10.2f} ms  "
+                     f"平均 {mean:9.2f} us  最大 {h['max'] * 1e6:9.2f} us")
+    for name, n in sorted(counters.items()):
+        lines.append(f"{name:24} 计数 {n:8}")
+    return '\n'.join(lines) if lines else "暂无统计数据"
+
+
+# 设置环境变量 LAB01_STATS=<文件名> 可在任意进程中开启统计，并在退出时写出JSON
+_stats_file = os.environ.get('LAB01_STATS')
+if _stats_file:
+    enable()
+    atexit.register(dump, _stats_file)
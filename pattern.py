@@ -0,0 +1,151 @@
+from lab01.board import Board
+
+# 3×3 邻域的8个邻点，每个邻点占2位：0空 1黑 2白 3棋盘外
+OFFSETS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+EDGE = 3
+PATTERN_COUNT = 1 << (2 * len(OFFSETS))
+
+_tables = {}
+_empty_patterns = {}
+_weights = None
+_swapped = None
+
+
+def _neighbor_table(size):
+    # 每个点落子后需要更新的邻点及其在邻点编码中的位移，同一尺寸的棋盘共用
+    table = _tables.get(size)
+    if table is None:
+        table = []
+        for y in range(size):
+            for x in range(size):
+                entries = []
+                for k, (dx, dy) in enumerate(OFFSETS):
+                    nx, ny = x - dx, y - dy
+                    if 0 <= nx < size and 0 <= ny < size:
+                        # 从邻点 (nx, ny) 看，(x, y) 位于第k个方向
+                        entries.append((ny * size + nx, 2 * k))
+                table.append(entries)
+        _tables[size] = table
+    return table
+
+
+def _empty_board_patterns(size):
+    patterns = _empty_patterns.get(size)
+    if patterns is None:
+        patterns = []
+        for y in range(size):
+            for x in range(size):
+                code = 0
+                for k, (dx, dy) in enumerate(OFFSETS):
+                    if not (0 <= x + dx < size and 0 <= y + dy < size):
+                        code |= EDGE << (2 * k)
+                patterns.append(code)
+        _empty_patterns[size] = patterns
+    return patterns
+
+
+class PatternBoard(Board):
+    # 为每个点维护3×3邻域编码，落子和提子时只更新周围8个点
+    def __init__(self, size):
+        super().__init__(size)
+        self.patterns = _empty_board_patterns(size)[:]
+
+    def copy(self):
+        board = super().copy()
+        board.patterns = self.patterns[:]
+        return board
+
+    def place_stone(self, x, y, color):
+        super().place_stone(x, y, color)
+        self._update(x, y, color)
+
+    def remove_stone(self, x, y):
+        old = self.grid[y][x]
+        super().remove_stone(x, y)
+        self._update(x, y, -old)
+
+    def _update(self, x, y, delta):
+        patterns = self.patterns
+        for index, shift in _neighbor_table(self.size)[y * self.size + x]:
+            patterns[index] += delta << shift
+
+    def pattern(self, x, y):
+        return self.patterns[y * self.size + x]
+
+
+def swap_colors(code):
+    # 交换编码中的黑白，使白方可以使用按黑方视角给出的权重表
+    result = 0
+    for k in range(len(OFFSETS)):
+        value = (code >> (2 * k)) & 3
+        if value == Board.BLACK:
+            value = Board.WHITE
+        elif value == Board.WHITE:
+            value = Board.BLACK
+        result |= value << (2 * k)
+    return result
+
+
+def _half_features(half, first):
+    # 统计半个编码（4个邻点）中的己方、对方、棋盘外，以及被己方和被对方堵住的正交方向数
+    own = opponent = edge = blocked = enclosed = 0
+    for k in range(4):
+        value = (half >> (2 * k)) & 3
+        dx, dy = OFFSETS[first + k]
+        orthogonal = dx == 0 or dy == 0
+        if value == Board.BLACK:
+            own += 1
+            blocked += orthogonal
+        elif value == Board.WHITE:
+            opponent += 2 if orthogonal else 1
+            enclosed += orthogonal
+        elif value == EDGE:
+            edge += 1
+            blocked += orthogonal
+            enclosed += orthogonal
+    return own, opponent, edge, blocked, enclosed
+
+
+def default_weights():
+    # 简单的启发式：贴近对方棋子、靠近己方棋子的点优先，填自己的眼、下在对方眼里和靠边的点靠后。
+    # 按高低两个字节分别统计特征再组合，避免对65536个编码逐位展开
+    low = [_half_features(h, 0) for h in range(256)]
+    high = [_half_features(h, 4) for h in range(256)]
+    weights = []
+    for hi in high:
+        for lo in low:
+            own = lo[0] + hi[0]
+            opponent = lo[1] + hi[1]
+            if lo[3] + hi[3] == 4 and opponent == 0:
+                weights.append(0.01)
+            elif lo[4] + hi[4] == 4:
+                # 对方的眼：不能提子时是自杀点
+                weights.append(0.01)
+            else:
+                weights.append(max(0.1, 1.0 + 0.3 * own + 0.5 * opponent - 0.2 * (lo[2] + hi[2])))
+    return weights
+
+
+def _build_tables():
+    global _swapped
+    if _weights is None:
+        set_pattern_weights(default_weights())
+    if _swapped is None:
+        half = [swap_colors(h) for h in range(256)]
+        _swapped = [half[code & 255] | half[code >> 8] << 8 for code in range(PATTERN_COUNT)]
+
+
+def set_pattern_weights(weights):
+    # weights 按黑方落子的视角给出，长度为 PATTERN_COUNT
+    global _weights
+    if len(weights) != PATTERN_COUNT:
+        raise ValueError("模式权重表长度错误")
+    _weights = list(weights)
+
+
+def pattern_weight(code, color):
+    if _weights is None or _swapped is None:
+        _build_tables()
+    if color == Board.WHITE:
+        code = _swapped[code]
+    return _weights[code]
@@ -0,0 +1,63 @@
+import copy
+import threading
+
+
+def position_of(game):
+    return tuple(tuple(row) for row in game.board.grid), game.current_player
+
+
+def _child(game, x, y):
+    # 复制局面并以不输出信息的快速路径走一步，由 _finish_replay 处理轮空和终局
+    child = copy.copy(game)
+    child.board = game.board.copy()
+    child.move_history = list(game.move_history)
+    if hasattr(game, 'flip_history'):
+        child.flip_history = list(game.flip_history)
+    child._fast_play(x, y, game.current_player)
+    child._finish_replay()
+    return child
+
+
+class Ponderer:
+    # 对手思考时在后台线程中预先计算：按可能性依次假设对手的每个应手，
+    # 算出AI对应的最佳回应，对手落子后直接取用命中的结果，其余丢弃。
+    # rank(game, color) 返回按评分从高到低排序的合法落子。
+    def __init__(self, rank):
+        self.rank = rank
+        self.results = {}
+        self.searched = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, game, ai_color):
+        self.stop()
+        self.results = {}
+        self.searched = 0
+        self._stop.clear()
+        snapshot = copy.deepcopy(game)
+        self._thread = threading.Thread(target=self._run, args=(snapshot, ai_color), daemon=True)
+        self._thread.start()
+
+    def _run(self, game, ai_color):
+        for x, y in self.rank(game, game.current_player):
+            if self._stop.is_set():
+                return
+            child = _child(game, x, y)
+            if child.is_over or child.current_player != ai_color:
+                continue
+            moves = self.rank(child, ai_color)
+            if moves:
+                self.results[position_of(child)] = moves[0]
+                self.searched += 1
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def take(self, game):
+        self.stop()
+        move = self.results.get(position_of(game))
+        self.results = {}
+        return move
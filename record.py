@@ -0,0 +1,306 @@
+from lab01.board import Board
+from lab01.registry import get_game_class
+
+# SGF 中 GM 属性对应的游戏类型
+SGF_GAME_TYPES = {1: 'go', 2: 'reversi', 4: 'gomoku'}
+
+COLUMNS = 'abcdefghijklmnopqrs'
+# 根节点中的摆子属性，可以有多个值
+SETUP_PROPERTIES = {'AB': Board.BLACK, 'AW': Board.WHITE, 'AE': Board.EMPTY}
+CHUNK_SIZE = 64 * 1024
+
+
+class GameRecord:
+    def __init__(self, game_type, size, moves, properties=None, setup=None, first_player=Board.BLACK):
+        self.game_type = game_type
+        self.size = size
+        # moves 与 Game.move_history 格式一致：(x, y, color)，(None, None, color) 表示PASS
+        self.moves = moves
+        self.properties = properties or {}
+        # 与 Game.setup 格式一致的摆子，以及摆子后的先手方
+        self.setup = setup or []
+        self.first_player = first_player
+
+    def new_game(self):
+        # 摆好摆子、尚未落子的对局
+        game = get_game_class(self.game_type)(self.size)
+        if self.setup or self.first_player != Board.BLACK:
+            game.set_setup(self.setup, self.first_player)
+        return game
+
+    def build_game(self, validate=True):
+        game = self.new_game()
+        game.replay_moves(self.moves, validate=validate)
+        return game
+
+
+def record_from_game(game):
+    game_type = game.game_type
+    if game_type is None:
+        raise ValueError("未知的游戏类型")
+    moves = list(game.move_history)
+    if game_type == 'go':
+        moves = _insert_passes(moves, game.pass_count, game.first_player)
+    return GameRecord(game_type, game.board.size, moves, setup=list(game.setup),
+                      first_player=game.first_player)
+
+
+def _insert_passes(moves, trailing_passes, first_player=Board.BLACK):
+    # 围棋的 move_history 不记录PASS，同色连续落子说明对方中间PASS了一手
+    result = []
+    expected = first_player
+    for x, y, color in moves:
+        if color != expected:
+            result.append((None, None, expected))
+        result.append((x, y, color))
+        expected = Board.WHITE if color == Board.BLACK else Board.BLACK
+    for _ in range(trailing_passes):
+        result.append((None, None, expected))
+        expected = Board.WHITE if expected == Board.BLACK else Board.BLACK
+    return result
+
+
+# ---------------- SGF ----------------
+
+def _sgf_point(x, y):
+    if x is None:
+        return ''
+    return COLUMNS[x] + COLUMNS[y]
+
+
+def _sgf_escape(text):
+    return text.replace('\\', '\\\\').replace(']', '\\]')
+
+
+def format_sgf(record, comments=None):
+    gm = {v: k for k, v in SGF_GAME_TYPES.items()}[record.game_type]
+    parts = [f"(;FF[4]GM[{gm}]SZ[{record.size}]"]
+    for key, value in record.properties.items():
+        if key not in ('FF', 'GM', 'SZ', 'PL') and key not in SETUP_PROPERTIES:
+            parts.append(f"{key}[{_sgf_escape(str(value))}]")
+    for key, color in SETUP_PROPERTIES.items():
+        points = [_sgf_point(x, y) for x, y, c in record.setup if c == color]
+        if points:
+            parts.append(key + ''.join(f"[{p}]" for p in points))
+    if record.first_player != Board.BLACK:
+        parts.append("PL[W]")
+    for i, (x, y, color) in enumerate(record.moves):
+        tag = 'B' if color == Board.BLACK else 'W'
+        parts.append(f"\n;{tag}[{_sgf_point(x, y)}]")
+        if comments and comments[i]:
+            parts.append(f"C[{_sgf_escape(comments[i])}]")
+    parts.append(")\n")
+    return ''.join(parts)
+
+
+def write_sgf(records, f):
+    # records 可以是生成器，逐局写出，不需要整个棋谱集常驻内存
+    count = 0
+    for record in records:
+        if not isinstance(record, GameRecord):
+            record = record_from_game(record)
+        f.write(format_sgf(record))
+        count += 1
+    return count
+
+
+def iter_sgf(f, strict=True):
+    # 逐块读取、逐字符解析的状态机，内存占用只与单局棋谱大小有关。
+    # strict 为 False 时格式错误的对局以 ValueError 对象代替 GameRecord 产出，并跳到该局结束处继续解析
+    depth = 0
+    in_value = False
+    escape = False
+    main_line_done = False
+    ident = ''
+    value = []
+    prop = None
+    props = {}
+    moves = []
+    error = None
+
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        for ch in chunk:
+            if in_value:
+                if escape:
+                    value.append(ch)
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == ']':
+                    in_value = False
+                    if not main_line_done and error is None:
+                        try:
+                            _sgf_property(prop, ''.join(value), props, moves)
+                        except (ValueError, IndexError):
+                            error = ValueError(f"SGF格式错误：无效的属性 {prop}[{''.join(value)}]")
+                            if strict:
+                                raise error from None
+                else:
+                    value.append(ch)
+            elif ch == '[':
+                in_value = True
+                value = []
+                if ident:
+                    prop = ident
+                    ident = ''
+            elif ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+                if depth == 0:
+                    if error is None:
+                        try:
+                            record = _sgf_record(props, moves)
+                        except ValueError as e:
+                            if strict:
+                                raise
+                            record = e
+                    else:
+                        record = error
+                    yield record
+                    props = {}
+                    moves = []
+                    main_line_done = False
+                    error = None
+                else:
+                    # 只取主分支，第一个变化结束后忽略其余分支
+                    main_line_done = True
+            elif ch == ';':
+                ident = ''
+            elif ch.isalpha():
+                ident += ch
+            elif not ch.isspace() and error is None:
+                error = ValueError(f"SGF格式错误：意外的字符 {ch!r}")
+                if strict:
+                    raise error
+    if depth != 0:
+        if strict:
+            raise ValueError("SGF格式错误：括号不匹配")
+        yield ValueError("SGF格式错误：括号不匹配")
+
+
+def _sgf_property(prop, value, props, moves):
+    if prop in ('B', 'W'):
+        color = Board.BLACK if prop == 'B' else Board.WHITE
+        size = int(props.get('SZ', 19))
+        if value == '' or (value == 'tt' and size <= 19):
+            moves.append((None, None, color))
+        else:
+            moves.append((COLUMNS.index(value[0]), COLUMNS.index(value[1]), color))
+    elif prop in SETUP_PROPERTIES:
+        if moves:
+            raise ValueError("不支持对局中途的摆子")
+        props.setdefault(prop, []).extend(_sgf_points(value))
+    elif prop not in props:
+        props[prop] = value
+
+
+def _sgf_points(value):
+    # 单点 "cd"，或压缩的矩形区域 "aa:cc"
+    if ':' not in value:
+        return [(COLUMNS.index(value[0]), COLUMNS.index(value[1]))]
+    first, last = value.split(':')
+    x1, y1 = COLUMNS.index(first[0]), COLUMNS.index(first[1])
+    x2, y2 = COLUMNS.index(last[0]), COLUMNS.index(last[1])
+    return [(x, y) for y in range(min(y1, y2), max(y1, y2) + 1)
+            for x in range(min(x1, x2), max(x1, x2) + 1)]
+
+
+def _sgf_record(props, moves):
+    gm = int(props.get('GM', 1))
+    if gm not in SGF_GAME_TYPES:
+        raise ValueError(f"不支持的SGF游戏类型 GM[{gm}]")
+    game_type = SGF_GAME_TYPES[gm]
+    size = int(props.get('SZ', 8 if game_type == 'reversi' else 19))
+    if game_type != 'go':
+        # 五子棋没有PASS，黑白棋的PASS由规则自动处理
+        moves = [m for m in moves if m[0] is not None]
+    setup = [(x, y, color) for prop, color in SETUP_PROPERTIES.items() for x, y in props.get(prop, [])]
+    if 'PL' in props:
+        first_player = Board.WHITE if props['PL'].upper() in ('W', '2') else Board.BLACK
+    elif moves:
+        # 没有 PL 时以第一手的落子方为先手（让子棋通常由白方先走）
+        first_player = moves[0][2]
+    else:
+        first_player = Board.BLACK
+    extra = {k: v for k, v in props.items()
+             if k not in ('FF', 'GM', 'SZ', 'PL') and k not in SETUP_PROPERTIES}
+    return GameRecord(game_type, size, moves, extra, setup, first_player)
+
+
+# ---------------- 黑白棋棋谱 ----------------
+# 每行一局，坐标为列字母加行号，例如 f5d6c3d3c4，PASS 不写出
+
+def format_transcript(record):
+    return ''.join(f"{COLUMNS[x]}{y + 1}" for x, y, _ in record.moves if x is not None)
+
+
+def write_transcript(records, f):
+    count = 0
+    for record in records:
+        if not isinstance(record, GameRecord):
+            record = record_from_game(record)
+        if record.game_type != 'reversi':
+            raise ValueError("棋谱格式只支持黑白棋")
+        if record.setup:
+            raise ValueError("黑白棋棋谱不能记录摆子，请导出为SGF")
+        f.write(format_transcript(record) + '\n')
+        count += 1
+    return count
+
+
+def iter_transcript(f, strict=True):
+    # strict 为 False 时无法解析的行以 ValueError 对象产出
+    for line in f:
+        line = line.strip().lower()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            moves = _parse_transcript(line)
+        except (ValueError, IndexError):
+            if strict:
+                raise ValueError(f"棋谱格式错误：{line}") from None
+            yield ValueError(f"棋谱格式错误：{line}")
+            continue
+        yield GameRecord('reversi', 8, moves)
+
+
+def _parse_transcript(line):
+    # 记录中不含落子方，按黑白棋规则模拟出轮空后的落子方
+    game = get_game_class('reversi')()
+    moves = []
+    for i in range(0, len(line), 2):
+        x = COLUMNS.index(line[i])
+        y = int(line[i + 1]) - 1
+        color = game.current_player
+        if not game._is_valid_move(x, y, color):
+            color = game._opponent_color(color)
+        game._place_and_flip(x, y, color)
+        game.current_player = game._opponent_color(color)
+        moves.append((x, y, color))
+    return moves
+
+
+# ---------------- 文件接口 ----------------
+
+def iter_records(filename, strict=True):
+    with open(filename, 'r', encoding='utf-8') as f:
+        if filename.endswith('.sgf'):
+            yield from iter_sgf(f, strict)
+        else:
+            yield from iter_transcript(f, strict)
+
+
+def export_records(games, filename):
+    with open(filename, 'w', encoding='utf-8') as f:
+        if filename.endswith('.sgf'):
+            return write_sgf(games, f)
+        return write_transcript(games, f)
+
+
+def import_games(filename, validate=True):
+    for record in iter_records(filename):
+        yield record.build_game(validate=validate)
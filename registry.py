@@ -0,0 +1,34 @@
+import importlib
+
+# 游戏类型 -> (模块, 类名)，只在第一次用到某种游戏时才导入对应模块
+GAME_TYPES = {
+    'gomoku': ('lab01.game', 'GomokuGame'),
+    'go': ('lab01.game', 'GoGame'),
+    'reversi': ('lab01.game', 'Reversi'),
+}
+
+_classes = {}
+
+
+def register(game_type, module, class_name):
+    GAME_TYPES[game_type] = (module, class_name)
+    _classes.pop(game_type, None)
+
+
+def get_game_class(game_type):
+    cls = _classes.get(game_type)
+    if cls is None:
+        if game_type not in GAME_TYPES:
+            raise ValueError("未知的游戏类型")
+        module, class_name = GAME_TYPES[game_type]
+        cls = _classes[game_type] = getattr(importlib.import_module(module), class_name)
+    return cls
+
+
+def create_game(game_type, board_size):
+    return get_game_class(game_type)(board_size)
+
+
+def load_game(filename):
+    from lab01.game import Game
+    return Game.load_game(filename)
@@ -0,0 +1,366 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import random
+import struct
+
+from lab01.board import Board
+from lab01.game import Reversi
+
+SIZE = 8
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# 经典的黑白棋位置权重，仅用于生成默认的模式表
+SQUARE_WEIGHTS = [
+    [100, -20, 10, 5, 5, 10, -20, 100],
+    [-20, -50, -2, -2, -2, -2, -50, -20],
+    [10, -2, -1, -1, -1, -1, -2, 10],
+    [5, -2, -1, -1, -1, -1, -2, 5],
+    [5, -2, -1, -1, -1, -1, -2, 5],
+    [10, -2, -1, -1, -1, -1, -2, 10],
+    [-20, -50, -2, -2, -2, -2, -50, -20],
+    [100, -20, 10, 5, 5, 10, -20, 100],
+]
+
+
+def _rotations(cells, count=4):
+    # 依次旋转90度得到的实例，格子顺序随之对应
+    result = [cells]
+    for _ in range(count - 1):
+        cells = [(SIZE - 1 - y, x) for x, y in cells]
+        result.append(cells)
+    return result
+
+
+def _build_patterns():
+    # 同一类模式的各个实例都由第一个实例旋转得到，从而共用一张表；
+    # 镜像对称由每张表自身保证，见 _mirror_codes
+    patterns = []
+    for cells in _rotations([(k, 0) for k in range(SIZE)]):
+        patterns.append(('edge', cells))
+    for cells in _rotations([(i, j) for j in range(3) for i in range(3)]):
+        patterns.append(('corner', cells))
+    for cells in _rotations([(k, k) for k in range(SIZE)], 2):
+        patterns.append(('diag', cells))
+    return patterns
+
+
+PATTERNS = _build_patterns()
+PATTERN_TYPES = {'edge': SIZE, 'corner': 9, 'diag': SIZE}
+# 棋盘的四种镜像
+REFLECTIONS = [
+    lambda x, y: (SIZE - 1 - x, y),
+    lambda x, y: (x, SIZE - 1 - y),
+    lambda x, y: (y, x),
+    lambda x, y: (SIZE - 1 - y, SIZE - 1 - x),
+]
+
+# 每个格子所在的模式实例及其在三进制编码中的权值
+CELL_REFS = [[[] for _ in range(SIZE)] for _ in range(SIZE)]
+for _index, (_, _cells) in enumerate(PATTERNS):
+    for _k, (_x, _y) in enumerate(_cells):
+        CELL_REFS[_y][_x].append((_index, 3 ** _k))
+
+
+def _default_table(pattern_type):
+    # 把位置权重按覆盖次数平摊到各模式上，使所有模式之和等于覆盖格子的位置分
+    coverage = [[len(CELL_REFS[y][x]) for x in range(SIZE)] for y in range(SIZE)]
+    cells = next(c for t, c in PATTERNS if t == pattern_type)
+    length = len(cells)
+    table = []
+    for code in range(3 ** length):
+        value = 0.0
+        for x, y in cells:
+            digit = code % 3
+            code //= 3
+            if digit:
+                sign = 1 if digit == Board.BLACK else -1
+                value += sign * SQUARE_WEIGHTS[y][x] / coverage[y][x]
+        table.append(value)
+    return table
+
+
+def _mirror_codes(pattern_type):
+    # 把模式映射到自身的镜像（边：左右翻转，角：沿对角线翻转，对角线：首尾翻转）下编码的对应关系。
+    # 镜像前后是同一个局面，表中两个编码的值应当相同
+    cells = next(c for t, c in PATTERNS if t == pattern_type)
+    for reflect in REFLECTIONS:
+        order = [reflect(x, y) for x, y in cells]
+        if order != cells and sorted(order) == sorted(cells):
+            break
+    target = [3 ** cells.index(cell) for cell in order]
+    mirrors = []
+    for code in range(3 ** len(cells)):
+        mirrored = 0
+        for power in target:
+            mirrored += code % 3 * power
+            code //= 3
+        mirrors.append(mirrored)
+    return mirrors
+
+
+def symmetrize(tables):
+    # 对每张表取镜像编码的平均值，使评估结果不随棋盘的镜像改变
+    for pattern_type, table in tables.items():
+        for code, mirrored in enumerate(_mirror_codes(pattern_type)):
+            if code < mirrored:
+                table[code] = table[mirrored] = (table[code] + table[mirrored]) / 2
+
+
+class PatternEvaluator:
+    # 局面分 = 各模式表查表之和（黑方视角）+ 行动力差 + 稳定子差
+    def __init__(self, tables=None, mobility=5.0, stability=10.0):
+        if tables is None:
+            tables = {t: _default_table(t) for t in PATTERN_TYPES}
+        self.tables = tables
+        self.mobility = mobility
+        self.stability = stability
+        self._pattern_tables = [self.tables[t] for t, _ in PATTERNS]
+        self._fingerprint = None
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        tables = {t: data[t] for t in PATTERN_TYPES}
+        # 较早拟合出的权重文件不是对称的
+        symmetrize(tables)
+        return cls(tables, data['mobility'], data['stability'])
+
+    def save(self, filename):
+        data = dict(self.tables)
+        data['mobility'] = self.mobility
+        data['stability'] = self.stability
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def fingerprint(self):
+        # 权重的摘要，评估缓存的键带上它，换了权重后不会读到旧权重算出的分数
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=8)
+            for t in PATTERN_TYPES:
+                digest.update(struct.pack(f'<{len(self.tables[t])}d', *self.tables[t]))
+            digest.update(struct.pack('<dd', self.mobility, self.stability))
+            self._fingerprint = digest.digest()
+        return self._fingerprint
+
+    def codes(self, grid):
+        codes = []
+        for _, cells in PATTERNS:
+            code = 0
+            power = 1
+            for x, y in cells:
+                code += grid[y][x] * power
+                power *= 3
+            codes.append(code)
+        return codes
+
+    def apply(self, codes, x, y, color, flipped):
+        # 落子及翻转后增量更新编码：空->己方加 color*3^k，对方->己方加 (color-对方)*3^k
+        for index, power in CELL_REFS[y][x]:
+            codes[index] += color * power
+        diff = color - (Board.WHITE if color == Board.BLACK else Board.BLACK)
+        for fx, fy in flipped:
+            for index, power in CELL_REFS[fy][fx]:
+                codes[index] += diff * power
+
+    def revert(self, codes, x, y, color, flipped):
+        for index, power in CELL_REFS[y][x]:
+            codes[index] -= color * power
+        diff = color - (Board.WHITE if color == Board.BLACK else Board.BLACK)
+        for fx, fy in flipped:
+            for index, power in CELL_REFS[fy][fx]:
+                codes[index] -= diff * power
+
+    def table_score(self, codes):
+        tables = self._pattern_tables
+        return sum(tables[i][code] for i, code in enumerate(codes))
+
+    def evaluate(self, grid, color, codes=None):
+        if codes is None:
+            codes = self.codes(grid)
+        opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+        score = self.table_score(codes)
+        if color == Board.WHITE:
+            score = -score
+        if self.mobility:
+            score += self.mobility * (mobility(grid, color) - mobility(grid, opponent))
+        if self.stability:
+            score += self.stability * (stable_discs(grid, color) - stable_discs(grid, opponent))
+        return score
+
+    def score_move(self, game, x, y, color, codes=None):
+        # 在棋盘上试下一步、评估后立即还原，编码只做增量修改
+        if codes is None:
+            codes = self.codes(game.board.grid)
+        grid = game.board.grid
+        flipped = _collect_flips(grid, x, y, color)
+        grid[y][x] = color
+        for fx, fy in flipped:
+            grid[fy][fx] = color
+        self.apply(codes, x, y, color, flipped)
+        try:
+            return self.evaluate(grid, color, codes)
+        finally:
+            self.revert(codes, x, y, color, flipped)
+            opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+            for fx, fy in flipped:
+                grid[fy][fx] = opponent
+            grid[y][x] = Board.EMPTY
+
+
+def _collect_flips(grid, x, y, color):
+    opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+    flipped = []
+    for dx, dy in DIRECTIONS:
+        line = []
+        nx, ny = x + dx, y + dy
+        while 0 <= nx < SIZE and 0 <= ny < SIZE and grid[ny][nx] == opponent:
+            line.append((nx, ny))
+            nx += dx
+            ny += dy
+        if line and 0 <= nx < SIZE and 0 <= ny < SIZE and grid[ny][nx] == color:
+            flipped.extend(line)
+    return flipped
+
+
+def mobility(grid, color):
+    # 只检查与对方棋子相邻的空点
+    opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+    count = 0
+    for y in range(SIZE):
+        row = grid[y]
+        for x in range(SIZE):
+            if row[x] != Board.EMPTY:
+                continue
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < SIZE and 0 <= ny < SIZE) or grid[ny][nx] != opponent:
+                    continue
+                while 0 <= nx < SIZE and 0 <= ny < SIZE and grid[ny][nx] == opponent:
+                    nx += dx
+                    ny += dy
+                if 0 <= nx < SIZE and 0 <= ny < SIZE and grid[ny][nx] == color:
+                    count += 1
+                    break
+    return count
+
+
+def stable_discs(grid, color):
+    # 近似的稳定子：从己方占据的角出发，沿两条边连续的己方棋子
+    stable = set()
+    for cx, cy, sx, sy in [(0, 0, 1, 1), (7, 0, -1, 1), (0, 7, 1, -1), (7, 7, -1, -1)]:
+        if grid[cy][cx] != color:
+            continue
+        for dx, dy in ((sx, 0), (0, sy)):
+            x, y = cx, cy
+            while 0 <= x < SIZE and 0 <= y < SIZE and grid[y][x] == color:
+                stable.add((x, y))
+                x += dx
+                y += dy
+    return len(stable)
+
+
+_default = None
+
+
+def default_evaluator():
+    global _default
+    if _default is None:
+        _default = PatternEvaluator()
+    return _default
+
+
+# ---------------- 自对弈与权重拟合 ----------------
+
+def self_play(games, seed=None, epsilon=0.1, evaluator=None):
+    # 用当前评估函数贪心自对弈，以 epsilon 的概率随机走子以增加多样性
+    rng = random.Random(seed)
+    evaluator = evaluator or default_evaluator()
+    for _ in range(games):
+        game = Reversi()
+        with contextlib.redirect_stdout(io.StringIO()):
+            while not game.is_over:
+                color = game.current_player
+                moves = [(x, y) for x in range(SIZE) for y in range(SIZE) if game._is_valid_move(x, y, color)]
+                if rng.random() < epsilon:
+                    move = rng.choice(moves)
+                else:
+                    codes = evaluator.codes(game.board.grid)
+                    move = max(moves, key=lambda m: evaluator.score_move(game, m[0], m[1], color, codes))
+                game.play_move(*move)
+        yield game
+
+
+def _features(evaluator, grid):
+    return (evaluator.codes(grid),
+            mobility(grid, Board.BLACK) - mobility(grid, Board.WHITE),
+            stable_discs(grid, Board.BLACK) - stable_discs(grid, Board.WHITE))
+
+
+def fit(records, epochs=3, learning_rate=0.01, evaluator=None):
+    # 以终局子数差为目标，对模式表、行动力和稳定子权重做随机梯度下降
+    evaluator = evaluator or PatternEvaluator()
+    samples = []
+    for record in records:
+        game = Reversi()
+        positions = []
+        for x, y, color in record.moves:
+            game._fast_play(x, y, color)
+            positions.append(_features(evaluator, game.board.grid))
+        black = sum(row.count(Board.BLACK) for row in game.board.grid)
+        white = sum(row.count(Board.WHITE) for row in game.board.grid)
+        samples.extend((features, black - white) for features in positions)
+
+    tables = evaluator._pattern_tables
+    # 每次更新平分给编码和它的镜像编码，表始终保持对称
+    mirrors = {t: _mirror_codes(t) for t in PATTERN_TYPES}
+    pattern_mirrors = [mirrors[t] for t, _ in PATTERNS]
+    for _ in range(epochs):
+        random.shuffle(samples)
+        for (codes, mob, stab), target in samples:
+            prediction = (evaluator.table_score(codes) + evaluator.mobility * mob
+                          + evaluator.stability * stab)
+            error = target - prediction
+            step = learning_rate * error
+            share = step / len(codes) / 2
+            for i, code in enumerate(codes):
+                tables[i][code] += share
+                tables[i][pattern_mirrors[i][code]] += share
+            evaluator.mobility += step * mob * 0.01
+            evaluator.stability += step * stab * 0.01
+    evaluator._fingerprint = None
+    return evaluator, len(samples)
+
+
+def main(argv=None):
+    from lab01.record import export_records, iter_records
+
+    parser = argparse.ArgumentParser(description="黑白棋模式评估：自对弈生成棋谱与拟合权重")
+    sub = parser.add_subparsers(dest='command', required=True)
+    play = sub.add_parser('selfplay', help="自对弈并写出黑白棋棋谱")
+    play.add_argument('output')
+    play.add_argument('-n', '--games', type=int, default=100)
+    play.add_argument('--seed', type=int, default=None)
+    train = sub.add_parser('fit', help="从棋谱拟合权重并写出JSON")
+    train.add_argument('records')
+    train.add_argument('output')
+    train.add_argument('--epochs', type=int, default=3)
+    train.add_argument('--lr', type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    if args.command == 'selfplay':
+        count = export_records(self_play(args.games, args.seed), args.output)
+        print(f"已写出 {count} 局自对弈棋谱至 {args.output}")
+    else:
+        records = (r for r in iter_records(args.records) if r.game_type == 'reversi')
+        evaluator, samples = fit(records, args.epochs, args.lr)
+        evaluator.save(args.output)
+        print(f"已用 {samples} 个局面拟合权重，写出至 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,39 @@
+import contextlib
+import io
+
+from lab01 import analyze
+from lab01.game import Reversi
+from lab01.record import record_from_game
+
+
+def play(moves):
+    game = Reversi()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for x, y in moves:
+            game.play_move(x, y)
+    return record_from_game(game)
+
+
+def first_moves(count):
+    game = Reversi()
+    moves = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            color = game.current_player
+            move = next((x, y) for y in range(8) for x in range(8) if game._is_valid_move(x, y, color))
+            game.play_move(*move)
+            moves.append(move)
+    return moves
+
+
+def test_cache_reuses_symmetric_positions():
+    moves = first_moves(6)
+    record = play(moves)
+    mirrored = play([(y, x) for x, y in moves])
+    _, (plies, mirrored_plies) = analyze.analyze_records([record, mirrored], workers=1)
+
+    # 沿对角线镜像的棋谱每一手都命中缓存，评分相同
+    assert analyze._cache.stats()['hits'] == len(moves)
+    for ply, other in zip(plies, mirrored_plies):
+        assert other['score'] == ply['score']
+        assert other['best_score'] == ply['best_score']
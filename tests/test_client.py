@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from lab01.AccountManager import AccountManager
+from lab01.client_new import Client
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return Client()
+
+
+def test_script_plays_game_to_completion(client, capsys):
+    lines = ['start gomoku 9'] + [f"move {x} {y}" for x in range(4) for y in (0, 1)] + ['move 4 0']
+    assert client.run_script(lines, display=False, json_output=True) == 0
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert all(r['ok'] for r in results)
+    assert results[-1]['game']['is_over']
+
+
+def test_result_updates_both_logged_in_players(client):
+    accounts = AccountManager()
+    accounts.register('alice', 'a')
+    accounts.register('bob', 'b')
+    client.user1, client.user2 = 'alice', 'bob'
+    lines = ['start gomoku 9'] + [f"move {x} {y}" for x in range(4) for y in (0, 1)] + ['move 4 0']
+    assert client.run_script(lines, display=False) == 0
+    stats = AccountManager().accounts
+    assert (stats['alice']['games'], stats['alice']['wins']) == (1, 1)
+    assert (stats['bob']['games'], stats['bob']['wins']) == (1, 0)
+
+
+def test_shared_cache_separates_weights(tmp_path, monkeypatch):
+    from lab01.game import Reversi
+    from lab01.reversi_eval import PatternEvaluator
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('LAB01_EVAL_CACHE', str(tmp_path / 'cache'))
+    game = Reversi()
+    first = Client()
+    first._ranked_moves(game, game.current_player)
+
+    # 另一个进程换用不同的权重，不能读到前一个进程写入共享表的分数
+    weights = PatternEvaluator(mobility=-5.0, stability=0.0)
+    weights.save(str(tmp_path / 'weights.json'))
+    monkeypatch.setenv('LAB01_REVERSI_WEIGHTS', str(tmp_path / 'weights.json'))
+    second = Client()
+    second._ranked_moves(game, game.current_player)
+    assert second.eval_cache.stats()['shared_hits'] == 0
+    third = Client()
+    third._ranked_moves(game, game.current_player)
+    assert third.eval_cache.stats()['shared_hits'] > 0
+
+
+def test_analyze_passes_budget_and_active_weights(client, monkeypatch):
+    from lab01 import analyze
+    from lab01.reversi_eval import PatternEvaluator
+
+    calls = []
+
+    def analyze_file(*args, **options):
+        calls.append((args, options))
+        return 'out.sgf', []
+    monkeypatch.setattr(analyze, 'analyze_file', analyze_file)
+    PatternEvaluator(mobility=1.0).save('w.json')
+    client.run_script(['weights w.json', 'analyze games.txt budget 0.5',
+                       'analyze games.txt out.sgf weights default'], display=False)
+    assert calls == [(('games.txt', None), {'budget': 0.5, 'weights': 'w.json'}),
+                     (('games.txt', 'out.sgf'), {'budget': None, 'weights': None})]
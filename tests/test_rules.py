@@ -0,0 +1,89 @@
+import contextlib
+import io
+
+import pytest
+
+from lab01.board import Board
+from lab01.game import GomokuGame, GoGame, Reversi
+
+B, W = Board.BLACK, Board.WHITE
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    # 规则引擎会打印胜负和轮空信息
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def grid_of(game):
+    return [row[:] for row in game.board.grid]
+
+
+def test_gomoku_undo_winning_move():
+    game = GomokuGame(15)
+    for x in range(4):
+        game.play_move(x, 0)
+        game.play_move(x, 1)
+    before = grid_of(game)
+    game.play_move(4, 0)
+    assert game.is_over
+
+    game.undo_move()
+    assert not game.is_over
+    assert game.current_player == B
+    assert game.board.grid == before
+    game.play_move(4, 0)
+    assert game.is_over
+
+
+def test_reversi_undo_final_move():
+    game = Reversi()
+    while not game.is_over:
+        color = game.current_player
+        x, y = next((x, y) for y in range(8) for x in range(8) if game._is_valid_move(x, y, color))
+        before = grid_of(game)
+        game.play_move(x, y)
+
+    game.undo_move()
+    assert not game.is_over
+    assert game.current_player == color
+    assert game.board.grid == before
+    game.play_move(x, y)
+    assert game.is_over
+
+
+def test_go_rejected_ko_recapture_keeps_capture_count():
+    # 白提劫后黑立即提回会重复摆子后的局面
+    game = GoGame(9)
+    game.set_setup([(1, 0, B), (2, 0, W), (0, 1, B), (2, 1, B), (3, 1, W), (1, 2, B), (2, 2, W)], W)
+    game.play_move(1, 1)
+    assert game.captured_stones == {B: 0, W: 1}
+
+    with pytest.raises(ValueError):
+        game.play_move(2, 1)
+    assert game.captured_stones == {B: 0, W: 1}
+    assert game.current_player == B
+
+
+def test_go_undo_after_capture():
+    game = GoGame(9)
+    for move in [(1, 0), (0, 0), (8, 8)]:
+        game.play_move(*move)
+    before = grid_of(game)
+    game.play_move(None, None)
+    game.play_move(0, 1)
+    after_capture = grid_of(game)
+    game.play_move(5, 5)
+
+    # 悔掉提子之后的一步：被提的子不能回到棋盘上
+    game.undo_move()
+    assert game.board.grid == after_capture
+    assert game.board.is_empty(0, 0)
+    assert game.captured_stones == {B: 1, W: 0}
+    assert game.current_player == W
+
+    game.undo_move()
+    assert game.board.grid == before
+    assert game.captured_stones == {B: 0, W: 0}
+    assert game.current_player == B
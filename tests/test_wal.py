@@ -0,0 +1,34 @@
+from lab01.registry import create_game
+from lab01.wal import MoveLog, recover
+
+
+def play(game, log, x, y):
+    color = game.current_player
+    game.play_move(x, y)
+    log.log_move(x, y, color)
+
+
+def test_recover_after_torn_tail_and_continue(tmp_path):
+    path = str(tmp_path / 'game.wal')
+    game = create_game('gomoku', 9)
+    log = MoveLog(path, game)
+    play(game, log, 0, 0)
+    play(game, log, 1, 1)
+    log.close()
+    # 崩溃时最后一行只写了一半
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("3 move 2")
+
+    game, seq = recover(path)
+    assert seq == 2
+    assert game.move_history == [(0, 0, 1), (1, 1, 2)]
+
+    log = MoveLog(path, game, seq)
+    play(game, log, 2, 2)
+    log.close()
+
+    game, seq = recover(path)
+    assert seq == 3
+    assert game.move_history == [(0, 0, 1), (1, 1, 2), (2, 2, 1)]
+    with open(path, encoding='utf-8') as f:
+        assert f.read().endswith("2 move 1 1 2\n3 move 2 2 1\n")
@@ -0,0 +1,213 @@
+from lab01.board import Board
+
+# 四个方向在带边框的一维棋盘上的步长都为正：横、竖、右下斜、左下斜
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (-1, 1)]
+EDGE = 3
+
+_MISSING = object()
+# 线段图案 -> 棋形数量，见 _shapes
+_shape_table = {}
+
+
+class ThreatIndex:
+    # 五子棋连子索引：每个方向上只在连子两端记录另一端的位置，
+    # 落子时只需查看相邻两格即可合并连子，成五点的维护每步 O(1)。
+    # 棋形按线段统计：线段是一个方向上不含对方棋子的最长一段，落子只改变经过落子点的线段，
+    # 重新识别这几段即可，跳空的冲四（XX.XX）和活三（.X.XX.）也计算在内。
+    # 所有修改都记入日志，悔棋时按日志逆序恢复。
+    def __init__(self, size):
+        self.size = size
+        self.stride = size + 2
+        self.steps = [dy * self.stride + dx for dx, dy in DIRECTIONS]
+        self.cells = [EDGE] * (self.stride * self.stride)
+        for y in range(size):
+            for x in range(size):
+                self.cells[self._index(x, y)] = Board.EMPTY
+        self.ends = [[0] * len(self.cells) for _ in DIRECTIONS]
+        # (方向, 线段起点, 玩家) -> ((棋形, 数量), ...)，只记录有威胁的线段
+        self.segments = {}
+        # (玩家, 棋形) -> 数量，棋形为 five / open_four / four / open_three
+        self.counts = {}
+        # 玩家 -> {空点: 可以成五的方向位掩码}
+        self.wins = {Board.BLACK: {}, Board.WHITE: {}}
+        self._journal = []
+        self._frame = None
+
+    def _index(self, x, y):
+        return (y + 1) * self.stride + x + 1
+
+    def _point(self, index):
+        return index % self.stride - 1, index // self.stride - 1
+
+    def _set(self, container, key, value):
+        if isinstance(container, dict):
+            self._frame.append((container, key, container.get(key, _MISSING)))
+            if value is None:
+                del container[key]
+                return
+        else:
+            self._frame.append((container, key, container[key]))
+        container[key] = value
+
+    def place(self, x, y, color):
+        self._frame = []
+        self._journal.append(self._frame)
+        cells = self.cells
+        p = self._index(x, y)
+        self._set(cells, p, color)
+        opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+
+        # 落子点不再是任何一方的获胜点
+        for player in (Board.BLACK, Board.WHITE):
+            if p in self.wins[player]:
+                self._set(self.wins[player], p, None)
+
+        for d, step in enumerate(self.steps):
+            ends = self.ends[d]
+            a = b = p
+            # 与两侧同色连子合并
+            if cells[p - step] == color:
+                a = ends[p - step]
+            if cells[p + step] == color:
+                b = ends[p + step]
+            self._set(ends, a, b)
+            self._set(ends, b, a)
+
+            # 己方经过落子点的线段范围不变，重新识别；对方的线段在落子点处断成两段
+            start, end = self._segment(p, step, opponent)
+            self._unclassify(d, start, color)
+            self._classify(d, start, end, color)
+            start, end = self._segment(p, step, color)
+            self._unclassify(d, start, opponent)
+            if start != p:
+                self._classify(d, start, p - step, opponent)
+            if end != p:
+                self._classify(d, p + step, end, opponent)
+
+            # 新连子两端的空点需要重新判断能否成五
+            for e in (a - step, b + step):
+                if cells[e] == Board.EMPTY:
+                    self._update_win(color, e, d, step)
+        self._frame = None
+
+    def undo(self):
+        if not self._journal:
+            raise ValueError("没有棋子可悔")
+        for container, key, old in reversed(self._journal.pop()):
+            if old is _MISSING:
+                del container[key]
+            else:
+                container[key] = old
+
+    def _segment(self, p, step, blocker):
+        # 从 p 向两侧延伸到 blocker 的棋子或边界为止，返回两端的位置；p 本身不检查
+        cells = self.cells
+        start = end = p
+        while cells[start - step] != blocker and cells[start - step] != EDGE:
+            start -= step
+        while cells[end + step] != blocker and cells[end + step] != EDGE:
+            end += step
+        return start, end
+
+    def _classify(self, d, start, end, player):
+        step = self.steps[d]
+        if (end - start) // step < 4:
+            return
+        line = ''.join('x' if self.cells[i] == player else '.' for i in range(start, end + step, step))
+        shapes = _shapes(line)
+        if shapes:
+            self._set(self.segments, (d, start, player), shapes)
+            for kind, n in shapes:
+                key = (player, kind)
+                self._set(self.counts, key, self.counts.get(key, 0) + n)
+
+    def _unclassify(self, d, start, player):
+        shapes = self.segments.get((d, start, player))
+        if shapes is not None:
+            self._set(self.segments, (d, start, player), None)
+            for kind, n in shapes:
+                count = self.counts[(player, kind)] - n
+                self._set(self.counts, (player, kind), count if count else None)
+
+    def _update_win(self, player, e, d, step):
+        # 空点两侧的同色棋子必然是连子端点，可以直接查到长度
+        cells = self.cells
+        ends = self.ends[d]
+        total = 1
+        if cells[e - step] == player:
+            total += (e - step - ends[e - step]) // step + 1
+        if cells[e + step] == player:
+            total += (ends[e + step] - e - step) // step + 1
+        wins = self.wins[player]
+        mask = wins.get(e, 0)
+        new_mask = mask | (1 << d) if total >= 5 else mask & ~(1 << d)
+        if new_mask != mask:
+            self._set(wins, e, new_mask if new_mask else None)
+
+    def count(self, player, kind):
+        # five：五连及以上；open_four：两端都能成五的四连；
+        # four：其余的成五点（冲四，含 XX.XX 这类跳四）；open_three：再下一子即成活四的三子（含跳三）
+        return self.counts.get((player, kind), 0)
+
+    def has_five(self, player):
+        return self.count(player, 'five') > 0
+
+    def has_open_four(self, player=None):
+        if player is None:
+            return self.has_open_four(Board.BLACK) or self.has_open_four(Board.WHITE)
+        return self.count(player, 'open_four') > 0
+
+    def count_live_threes(self, player):
+        return self.count(player, 'open_three')
+
+    def winning_squares(self, player):
+        return sorted(self._point(e) for e in self.wins[player])
+
+
+def _span(line, i):
+    # 在空点 i 落子后经过 i 的连子范围 [a, b)
+    a = i
+    while a > 0 and line[a - 1] == 'x':
+        a -= 1
+    b = i + 1
+    while b < len(line) and line[b] == 'x':
+        b += 1
+    return a, b
+
+
+def _shapes(line):
+    # line 是一条线段：'x' 为己方棋子，'.' 为空点，两端之外是对方棋子或边界
+    shapes = _shape_table.get(line)
+    if shapes is not None:
+        return shapes
+    n = len(line)
+    five = open_four = 0
+    i = 0
+    while i < n:
+        if line[i] != 'x':
+            i += 1
+            continue
+        j = i
+        while j < n and line[j] == 'x':
+            j += 1
+        if j - i >= 5:
+            five += 1
+        elif j - i == 4 and i > 0 and j < n:
+            open_four += 1
+        i = j
+    wins = 0
+    threes = set()
+    for i in range(n):
+        if line[i] != '.':
+            continue
+        a, b = _span(line, i)
+        if b - a >= 5:
+            wins += 1
+        elif b - a == 4 and a > 0 and b < n:
+            # 落子后成活四：原有的三子构成一个活三，不同落子点得到同样三子时只算一个
+            threes.add(tuple(k for k in range(a, b) if k != i))
+    counts = (('five', five), ('open_four', open_four),
+              ('four', max(0, wins - 2 * open_four)), ('open_three', len(threes)))
+    shapes = tuple((kind, count) for kind, count in counts if count)
+    _shape_table[line] = shapes
+    return shapes
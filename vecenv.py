@@ -0,0 +1,244 @@
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import numpy as np
+
+from lab01.board import Board
+
+# 前四个方向与后四个方向一一相反，五子棋按 d 与 d+4 合并成一条线
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1), (-1, 0), (0, -1), (-1, -1), (-1, 1)]
+# step 返回的结果：NOT_OVER 表示未结束，0 为平局，否则为胜方颜色
+NOT_OVER = -1
+
+_ray_tables = {}
+
+
+def _rays(size, length):
+    # 每个点沿8个方向依次经过的 length 个点在展平棋盘中的下标，出界时指向末尾恒为空的哨兵格
+    table = _ray_tables.get((size, length))
+    if table is None:
+        sentinel = size * size
+        table = np.full((size * size, len(DIRECTIONS), length), sentinel, dtype=np.intp)
+        for y in range(size):
+            for x in range(size):
+                for d, (dx, dy) in enumerate(DIRECTIONS):
+                    for k in range(length):
+                        nx, ny = x + dx * (k + 1), y + dy * (k + 1)
+                        if not (0 <= nx < size and 0 <= ny < size):
+                            break
+                        table[y * size + x, d, k] = ny * size + nx
+        _ray_tables[(size, length)] = table
+    return table
+
+
+class VecEnv:
+    # N 局同尺寸的对局同步推进：棋盘展平后叠成 (N, size*size+1) 的数组，最后一列是哨兵。
+    # 落子位置用 y*size+x 表示；结束的对局在 step 中记录结果后立即重置。
+    def __init__(self, num_envs, size, seed=None):
+        if not (8 <= size <= 19):
+            raise ValueError("棋盘大小必须在8到19之间")
+        self.num_envs = num_envs
+        self.size = size
+        self.cells = size * size
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.arange(num_envs)
+        self.boards = np.zeros((num_envs, self.cells + 1), dtype=np.int8)
+        self.players = np.full(num_envs, Board.BLACK, dtype=np.int8)
+        self.plies = np.zeros(num_envs, dtype=np.int32)
+        self.mask = np.zeros((num_envs, self.cells), dtype=bool)
+        self.steps = 0
+        self.finished = 0
+        self.reset()
+
+    def reset(self, envs=None):
+        if envs is None:
+            envs = self.rows
+        self.boards[envs] = Board.EMPTY
+        self.players[envs] = Board.BLACK
+        self.plies[envs] = 0
+        self._initialize(envs)
+        self.mask[envs] = self._legal(envs, self.players[envs])
+
+    def _initialize(self, envs):
+        # 子类摆放开局的棋子
+        pass
+
+    def _legal(self, envs, players):
+        # 子类实现具体的落子规则，返回这些对局的合法位置掩码
+        pass
+
+    def _apply(self, actions):
+        # 子类实现落子、翻转或连子判定，返回各局的结果
+        pass
+
+    def observation(self):
+        return self.boards[:, :self.cells].reshape(self.num_envs, self.size, self.size)
+
+    def grid(self, i):
+        return self.observation()[i].tolist()
+
+    def legal_moves(self, i):
+        return [(a % self.size, a // self.size) for a in np.flatnonzero(self.mask[i])]
+
+    def sample_actions(self):
+        # 每局在合法位置中均匀随机取一个
+        noise = self.rng.random(self.mask.shape)
+        noise[~self.mask] = -1.0
+        return noise.argmax(axis=1)
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.intp)
+        if not self.mask[self.rows, actions].all():
+            raise ValueError("无效的落子位置")
+        results = self._apply(actions)
+        self.plies += 1
+        self.steps += self.num_envs
+        done = np.flatnonzero(results != NOT_OVER)
+        if len(done):
+            self.finished += len(done)
+            self.reset(done)
+        return results
+
+
+class VecReversi(VecEnv):
+    # 规则与 Reversi 一致：落子必须翻转对方棋子，对方无子可下时轮空，双方都无子可下时终局
+    def __init__(self, num_envs, seed=None):
+        self.rays = _rays(8, 8)
+        super().__init__(num_envs, 8, seed)
+
+    def _initialize(self, envs):
+        mid = self.size // 2
+        for x, y, color in ((mid - 1, mid - 1, Board.WHITE), (mid, mid, Board.WHITE),
+                            (mid, mid - 1, Board.BLACK), (mid - 1, mid, Board.BLACK)):
+            self.boards[envs, y * self.size + x] = color
+
+    def _flips(self, actions):
+        # 沿落子点的8条射线：开头连续的对方棋子后接己方棋子时，这段对方棋子被翻转
+        players = self.players
+        idx = self.rays[actions]
+        values = self.boards[self.rows[:, None, None], idx]
+        run = np.logical_and.accumulate(values == (3 - players)[:, None, None], axis=-1)
+        length = run.sum(axis=-1)
+        # 射线最后一格总是哨兵，length 不会越界
+        end = np.take_along_axis(values, length[..., None], axis=-1)[..., 0]
+        valid = (length > 0) & (end == players[:, None])
+        r, d, k = np.nonzero(run & valid[..., None])
+        return r, idx[r, d, k]
+
+    def _legal(self, envs, players):
+        # 整块棋盘按方向平移后逐格推进：某点沿方向 d 先是连续的对方棋子、随后是己方棋子即可落子。
+        # 四周各补 size 格空白，平移就是取补齐后数组的一个切片
+        s = self.size
+        board = self.boards[envs, :self.cells].reshape(-1, s, s)
+        own = np.pad(board == players[:, None, None], ((0, 0), (s, s), (s, s)))
+        opponent = np.pad(board == (3 - players)[:, None, None], ((0, 0), (s, s), (s, s)))
+        legal = np.zeros(board.shape, dtype=bool)
+        for dx, dy in DIRECTIONS:
+            run = opponent[:, s + dy:2 * s + dy, s + dx:2 * s + dx]
+            for k in range(2, s):
+                if not run.any():
+                    break
+                legal |= run & own[:, s + k * dy:2 * s + k * dy, s + k * dx:2 * s + k * dx]
+                run = run & opponent[:, s + k * dy:2 * s + k * dy, s + k * dx:2 * s + k * dx]
+        return (legal & (board == Board.EMPTY)).reshape(-1, self.cells)
+
+    def _apply(self, actions):
+        rows, players = self.rows, self.players
+        r, cells = self._flips(actions)
+        self.boards[rows, actions] = players
+        self.boards[r, cells] = players[r]
+
+        opponents = 3 - players
+        opponent_mask = self._legal(rows, opponents)
+        has_moves = opponent_mask.any(axis=1)
+        self.players = np.where(has_moves, opponents, players).astype(np.int8)
+        self.mask = opponent_mask
+        # 对方无子可下：轮空，仍由本方落子；本方也无子可下则终局
+        stuck = np.flatnonzero(~has_moves)
+        results = np.full(self.num_envs, NOT_OVER, dtype=np.int8)
+        if len(stuck):
+            own_mask = self._legal(stuck, players[stuck])
+            self.mask[stuck] = own_mask
+            over = stuck[~own_mask.any(axis=1)]
+            black = (self.boards[over] == Board.BLACK).sum(axis=1)
+            white = (self.boards[over] == Board.WHITE).sum(axis=1)
+            results[over] = np.where(black > white, Board.BLACK, np.where(white > black, Board.WHITE, 0))
+        return results
+
+
+class VecGomoku(VecEnv):
+    # 规则与 GomokuGame 一致：任一方向连成五子及以上即胜；棋盘下满仍未分胜负按平局结束
+    def __init__(self, num_envs, size=15, seed=None):
+        self.rays = _rays(size, 4)
+        super().__init__(num_envs, size, seed)
+
+    def _legal(self, envs, players):
+        return self.boards[envs, :self.cells] == Board.EMPTY
+
+    def _apply(self, actions):
+        rows, players = self.rows, self.players
+        self.boards[rows, actions] = players
+        values = self.boards[rows[:, None, None], self.rays[actions]]
+        run = np.logical_and.accumulate(values == players[:, None, None], axis=-1).sum(axis=-1)
+        won = (run[:, :4] + run[:, 4:] + 1 >= 5).any(axis=1)
+        self.mask[rows, actions] = False
+        full = ~self.mask.any(axis=1)
+        results = np.full(self.num_envs, NOT_OVER, dtype=np.int8)
+        results[full] = 0
+        results[won] = players[won]
+        self.players = np.where(won, players, 3 - players).astype(np.int8)
+        return results
+
+
+def measure(env, steps):
+    # 随机对弈 steps 步，返回整批的每秒步数
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(env.sample_actions())
+    return env.num_envs * steps / (time.perf_counter() - start)
+
+
+def measure_scalar(game_type, steps, size=15, seed=None):
+    # 对照：用 Reversi / GomokuGame 逐局随机对弈的每秒步数
+    from lab01.game import GomokuGame, Reversi
+    rng = random.Random(seed)
+    new_game = Reversi if game_type == 'reversi' else lambda: GomokuGame(size)
+    game = new_game()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(steps):
+            moves = [(x, y) for y in range(game.board.size) for x in range(game.board.size)
+                     if game.board.is_empty(x, y)
+                     and (game_type != 'reversi' or game._is_valid_move(x, y, game.current_player))]
+            if game.is_over or not moves:
+                game = new_game()
+                continue
+            game.play_move(*rng.choice(moves))
+    return steps / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量同步对局环境的吞吐量测试")
+    parser.add_argument('game_type', choices=['reversi', 'gomoku'])
+    parser.add_argument('-n', '--envs', type=int, default=1024, help="同时进行的对局数")
+    parser.add_argument('-s', '--steps', type=int, default=200, help="推进的步数")
+    parser.add_argument('--size', type=int, default=15, help="五子棋棋盘大小")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.game_type == 'reversi':
+        env = VecReversi(args.envs, args.seed)
+    else:
+        env = VecGomoku(args.envs, args.size, args.seed)
+    rate = measure(env, args.steps)
+    scalar = measure_scalar(args.game_type, 2000, args.size, args.seed)
+    print(f"{args.envs} 局 × {args.steps} 步：{rate:.0f} 步/秒，完成 {env.finished} 局")
+    print(f"逐局对照：{scalar:.0f} 步/秒，加速 {rate / scalar:.1f} 倍")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
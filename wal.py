@@ -0,0 +1,167 @@
+import contextlib
+import io
+import os
+import pickle
+import queue
+import threading
+
+from lab01 import registry
+
+# 日志格式：首行 "# lab01 <game_type> <board_size>"，之后每行一个带序号的操作：
+#   <seq> move <x> <y> <color> / <seq> pass <color> / <seq> undo / <seq> restart / <seq> resign <color>
+# 检查点文件 <path>.ckpt 保存 {'seq': 序号, 'game': Game}，恢复时从检查点开始回放序号更大的操作
+
+
+class MoveLog:
+    def __init__(self, path, game, seq=0, group_size=16, group_interval=0.05, checkpoint_every=64):
+        self.path = path
+        self.game = game
+        self.seq = seq
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.checkpoint_every = checkpoint_every
+        self._pending = 0
+        self._since_checkpoint = 0
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        if seq == 0:
+            # 新对局：清空旧日志和检查点
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(f"# lab01 {game.game_type} {game.board.size}\n")
+            self._sync()
+            _remove(path + '.ckpt')
+        else:
+            # 续写恢复出的日志：先截去崩溃时未写完的最后一行，新记录才能从行首开始
+            _truncate_torn_tail(path)
+            self._file = open(path, 'a', encoding='utf-8')
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def log_move(self, x, y, color):
+        self._append(f"move {x} {y} {color}")
+
+    def log_pass(self, color):
+        self._append(f"pass {color}")
+
+    def log_undo(self):
+        self._append("undo")
+
+    def log_restart(self):
+        self._append("restart")
+
+    def log_resign(self, color):
+        self._append(f"resign {color}")
+
+    def _append(self, op):
+        # 只写入缓冲区，攒够 group_size 条或后台线程定时到期时再一并 fsync
+        with self._lock:
+            self.seq += 1
+            self._file.write(f"{self.seq} {op}\n")
+            self._pending += 1
+            if self._pending >= self.group_size:
+                self._sync()
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._sync()
+
+    def checkpoint(self):
+        # 在调用线程中序列化当前局面，写文件和 fsync 交给后台线程
+        self._since_checkpoint = 0
+        data = pickle.dumps({'seq': self.seq, 'game': self.game})
+        self._jobs.put(data)
+
+    def _run(self):
+        while True:
+            try:
+                data = self._jobs.get(timeout=self.group_interval)
+            except queue.Empty:
+                self.flush()
+                continue
+            if data is None:
+                return
+            self.flush()
+            _write_atomic(self.path + '.ckpt', data)
+
+    def close(self):
+        self._jobs.put(None)
+        self._worker.join()
+        self.flush()
+        self._file.close()
+
+
+def _remove(path):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def _truncate_torn_tail(path):
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def recover(path):
+    # 从最近的检查点加上日志尾部重建对局，返回 (game, 最后的序号)
+    game = None
+    seq = 0
+    if os.path.exists(path + '.ckpt'):
+        with open(path + '.ckpt', 'rb') as f:
+            checkpoint = pickle.load(f)
+        game, seq = checkpoint['game'], checkpoint['seq']
+    with open(path, 'r', encoding='utf-8') as f:
+        header = f.readline().split()
+        if len(header) != 4 or header[:2] != ['#', 'lab01']:
+            raise ValueError("日志文件格式错误")
+        if game is None:
+            game = registry.create_game(header[2], int(header[3]))
+        with contextlib.redirect_stdout(io.StringIO()):
+            for line in f:
+                if not line.endswith('\n'):
+                    # 崩溃时未写完的最后一行
+                    break
+                parts = line.split()
+                if int(parts[0]) <= seq:
+                    continue
+                _apply(game, parts[1:])
+                seq = int(parts[0])
+            if not game.is_over:
+                game._finish_replay()
+    return game, seq
+
+
+def _apply(game, op):
+    if op[0] == 'move':
+        game._fast_play(int(op[1]), int(op[2]), int(op[3]))
+    elif op[0] == 'pass':
+        game._fast_play(None, None, int(op[1]))
+    elif op[0] == 'undo':
+        game.undo_move()
+    elif op[0] == 'restart':
+        game.restart()
+    elif op[0] == 'resign':
+        game.is_over = True
+    else:
+        raise ValueError(f"未知的日志操作 {op[0]}")